@@ -0,0 +1,208 @@
+"""Short, speakable answer snippets per procedure, built from docs_kb fields at ingestion time.
+
+    python answer_snippets.py        # rebuild ANSWER_SNIPPETS_PATH from docs_kb
+
+The API's compact response mode returns these (plus an ``id`` to expand on
+demand) instead of full node summaries, so the voice agent's LLM reads a line
+per result rather than paragraphs.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+
+from attribute_index import parse_cost, parse_duration_days
+from generate_procedures_md import DOCS_DIR
+from ingestion_manifest import content_hash
+from md_builder import list_json_files, load_json
+from search_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+ANSWER_SNIPPETS_PATH = os.environ.get('ANSWER_SNIPPETS_PATH', 'answer_snippets.json')
+# Bump when the snippet wording changes, so every snippet's version tag changes with it
+SNIPPET_VERSION = "1"
+SNIPPET_MAX_CHARS = int(os.environ.get('SNIPPET_MAX_CHARS', '200'))
+# Fields returned when a snippet is expanded
+DETAIL_FIELDS = (
+    "procedure_type", "cost", "recovery_time", "results_duration", "explanation", "treatment_overview",
+    "miscellaneous_information",
+)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def first_sentence(text: str | None, max_chars: int = SNIPPET_MAX_CHARS) -> str:
+    text = " ".join((text or "").split())
+    sentence = _SENTENCE_END.split(text, maxsplit=1)[0]
+    if len(sentence) <= max_chars:
+        return sentence
+    return sentence[:max_chars].rsplit(" ", 1)[0] + "…"
+
+
+def spoken_days(low: float, high: float) -> str:
+    """'2 days', '1 to 2 weeks', '6 to 12 months' from a day range."""
+    for unit, days in (("year", 365), ("month", 30), ("week", 7), ("day", 1)):
+        if low >= days and low % days == 0 and high % days == 0:
+            low_n, high_n = int(low // days), int(high // days)
+            plural = "s" if high_n != 1 else ""
+            return f"{low_n} {unit}{plural}" if low_n == high_n else f"{low_n} to {high_n} {unit}s"
+    return f"{low:g} to {high:g} days" if low != high else f"{low:g} days"
+
+
+def _cost_phrase(text: str | None) -> str | None:
+    low, high = parse_cost(text)
+    if low is None:
+        return None
+    if high is None:
+        return f"from ${low:,.0f}"
+    return f"${low:,.0f}" if low == high else f"${low:,.0f} to ${high:,.0f}"
+
+
+def _duration_phrase(text: str | None, prefix: str, none_text: str | None = None) -> str | None:
+    low, high = parse_duration_days(text)
+    if low is None:
+        return None
+    if high == 0:
+        return none_text
+    return f"{prefix} {spoken_days(low, high)}"
+
+
+def procedure_snippet(procedure: dict) -> str:
+    """'Lip Filler: non-surgical, from $650, recovery about 1 to 2 days, results last 6 to 12 months.'
+
+    Falls back to the explanation's first sentence when none of the facts parse.
+    """
+    name = (procedure.get("procedure_name") or "").strip()
+    facts = [
+        (procedure.get("procedure_type") or "").strip().lower() or None,
+        _cost_phrase(procedure.get("cost")),
+        _duration_phrase(procedure.get("recovery_time"), "recovery about", "no downtime"),
+        _duration_phrase(procedure.get("results_duration"), "results last"),
+    ]
+    facts = [f for f in facts if f]
+    if len(facts) <= 1:
+        sentence = first_sentence(procedure.get("explanation") or procedure.get("treatment_overview")).rstrip(".")
+        first_word = sentence.split(" ", 1)[0]
+        # Mid-sentence after the comma, unless it starts with an acronym
+        if len(first_word) == 1 or not first_word.isupper():
+            sentence = sentence[:1].lower() + sentence[1:]
+        facts.append(sentence)
+    snippet = f"{name}: {', '.join(f for f in facts if f)}."
+    return first_sentence(snippet) if len(snippet) > SNIPPET_MAX_CHARS else snippet
+
+
+def build_snippets(docs_dir: str = DOCS_DIR) -> dict[str, dict]:
+    """Snippet entries keyed by id (the docs_kb file name without ``.json``)."""
+    snippets = {}
+    for fname in list_json_files(docs_dir):
+        procedure = load_json(os.path.join(docs_dir, fname)).get("json")
+        if not procedure or not isinstance(procedure, dict) or not procedure.get("procedure_name"):
+            continue
+        snippet_id = os.path.splitext(fname)[0]
+        snippets[snippet_id] = {
+            "id": snippet_id,
+            "name": procedure["procedure_name"].strip(),
+            "snippet": procedure_snippet(procedure),
+            # Changes with the wording and with the record, so cached answers can be told apart
+            "version": f"{SNIPPET_VERSION}-{content_hash(procedure)[:8]}",
+            "details": {field: procedure[field] for field in DETAIL_FIELDS if procedure.get(field)},
+        }
+    return snippets
+
+
+def write_snippets(docs_dir: str = DOCS_DIR, path: str = ANSWER_SNIPPETS_PATH) -> int:
+    """Rebuild the snippet file atomically; returns the snippet count. Failures are logged, never raised."""
+    try:
+        snippets = build_snippets(docs_dir)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": SNIPPET_VERSION, "snippets": snippets}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.warning(f"Could not write answer snippets to {path}: {e}")
+        return 0
+    logger.info(f"Wrote {len(snippets)} answer snippets to {path}")
+    return len(snippets)
+
+
+class SnippetStore:
+    """Answer snippets for the API, looked up by id or by procedure name; re-read when the file changes.
+
+    Like ``graph_snapshot.SnapshotStore``, lookups inside an event loop check the
+    file in a worker thread and keep using the loaded snippets until the new ones
+    are swapped in.
+    """
+
+    def __init__(self, path: str = ANSWER_SNIPPETS_PATH, check_seconds: float = 5.0):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.snippets: dict[str, dict] = {}
+        self._by_name: dict[str, dict] = {}
+        self.loaded_mtime = None
+        self._checked_at = 0.0
+        self._reload_task: asyncio.Task | None = None
+
+    def __len__(self):
+        return len(self.snippets)
+
+    def reload(self) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self.loaded_mtime:
+            return False
+        with open(self.path, "r") as f:
+            snippets = json.load(f).get("snippets", {})
+        self.snippets = snippets
+        self._by_name = {normalize_query(entry["name"]): entry for entry in snippets.values()}
+        self.loaded_mtime = mtime
+        return True
+
+    def _reload_quietly(self):
+        try:
+            self.reload()
+        except Exception as e:
+            logger.warning(f"Could not reload answer snippets from {self.path}: {e}")
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_seconds:
+            self._checked_at = now
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                self._reload_quietly()
+            else:
+                if self._reload_task is None or self._reload_task.done():
+                    self._reload_task = asyncio.create_task(asyncio.to_thread(self._reload_quietly))
+
+    def get(self, snippet_id: str) -> dict | None:
+        self._refresh()
+        return self.snippets.get(snippet_id)
+
+    def for_name(self, name: str | None) -> dict | None:
+        self._refresh()
+        return self._by_name.get(normalize_query(name or ""))
+
+    def compact(self, results: list[dict]) -> list[dict]:
+        """Results as ``{id, name, snippet, version}``; results without a stored snippet get a one-sentence
+        summary (or their fact) and no id."""
+        compacted = []
+        for result in results:
+            entry = self.for_name(result.get("name"))
+            if entry is not None:
+                compacted.append({k: entry[k] for k in ("id", "name", "snippet", "version")})
+            else:
+                text = result.get("fact") or result.get("summary")
+                compacted.append({"id": None, "name": result.get("name"), "snippet": first_sentence(text)})
+        return compacted
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    count = write_snippets()
+    print(f"Wrote {count} answer snippets to {ANSWER_SNIPPETS_PATH}")
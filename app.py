@@ -1,41 +1,65 @@
-from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
 import os
 import asyncio
+import functools
+import hmac
+import orjson
 from dotenv import load_dotenv
-from graphiti_core import Graphiti
 from fastapi.middleware.cors import CORSMiddleware
-from graphiti_core.search.search_config_recipes import (
-    COMBINED_HYBRID_SEARCH_RRF,     
-    COMBINED_HYBRID_SEARCH_MMR, 
-    COMBINED_HYBRID_SEARCH_CROSS_ENCODER,
-    EDGE_HYBRID_SEARCH_RRF,
-    EDGE_HYBRID_SEARCH_MMR,
-    EDGE_HYBRID_SEARCH_NODE_DISTANCE,
-    EDGE_HYBRID_SEARCH_EPISODE_MENTIONS,
-    EDGE_HYBRID_SEARCH_CROSS_ENCODER,
-    NODE_HYBRID_SEARCH_RRF,
-    NODE_HYBRID_SEARCH_MMR,
-    NODE_HYBRID_SEARCH_NODE_DISTANCE,
-    NODE_HYBRID_SEARCH_EPISODE_MENTIONS,
-    NODE_HYBRID_SEARCH_CROSS_ENCODER,
-    COMMUNITY_HYBRID_SEARCH_RRF,
-    COMMUNITY_HYBRID_SEARCH_MMR,
-    COMMUNITY_HYBRID_SEARCH_CROSS_ENCODER
-)
 from typing import List
 import logging
 
+from neo4j.exceptions import ServiceUnavailable, SessionExpired
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
+
+import metrics
+from logging_setup import configure_logging, payload_sampled, redact, sample_payload
+from answer_snippets import SnippetStore
+from attribute_index import AttributeIndex
+from concerns_index import CONCERNS_INDEX_DIR, ConcernsIndex
+from local_search import LocalSearchIndex
+from prefetch import PREFETCH_ENABLED, Prefetcher, fetch_neighbours
+from embedding_cache import install_embedding_cache
+from graph_snapshot import SnapshotStore
+from search_cache import SEARCH_SHARED_CACHE_DIR, SearchCache, SharedSearchCache, config_fingerprint
+from single_flight import SingleFlight
+from tiered_search import SEARCH_RECIPES, LatencyEstimates, Tier, search_with_deadline
+import warmup
+from warmup import StartupReport, WARM_START_MODE
+
 # --- Load environment variables ---
 load_dotenv()
 NEO4J_URI = os.environ.get('NEO4J_URI', 'bolt://localhost:7687')
 NEO4J_USER = os.environ.get('NEO4J_USER', 'neo4j')
 NEO4J_PASSWORD = os.environ.get('NEO4J_PASSWORD', 'password')
+# Bounds for fanned-out tool calls in a single /webhook-search request
+WEBHOOK_MAX_CONCURRENCY = int(os.environ.get('WEBHOOK_MAX_CONCURRENCY', '4'))
+WEBHOOK_TOOL_CALL_TIMEOUT = float(os.environ.get('WEBHOOK_TOOL_CALL_TIMEOUT', '8'))
+# "graph" searches Neo4j through Graphiti; "fast" uses the in-process docs_kb index
+SEARCH_DEFAULT_TIER = os.environ.get('SEARCH_DEFAULT_TIER', 'graph')
+# Default latency budgets per endpoint; callers can override with deadline_ms
+WEBHOOK_DEADLINE_MS = int(os.environ.get('WEBHOOK_DEADLINE_MS', '3000'))
+MANUAL_DEADLINE_MS = int(os.environ.get('MANUAL_DEADLINE_MS', '8000'))
+LOCAL_SEARCH_DOCS_DIR = os.environ.get('LOCAL_SEARCH_DOCS_DIR', 'docs_kb')
+# IVF lists scanned per /concerns-search query when the index has one; 0 = exact search
+CONCERNS_NPROBE = int(os.environ.get('CONCERNS_NPROBE', '0'))
+# Default for search responses: one short snippet + id per result instead of full summaries
+RESPONSE_COMPACT = os.environ.get('RESPONSE_COMPACT', '0') == '1'
+# Bearer token required by /cache/invalidate; unset disables the endpoint
+CACHE_ADMIN_TOKEN = os.environ.get('CACHE_ADMIN_TOKEN', '')
+NODE_SEARCH_LIMIT = 5
 
 app = FastAPI(
     title="Graphiti Minimal Search API",
     description="Minimal search endpoint using Graphiti. Accepts only a query string.",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
 )
 
 app.add_middleware(
@@ -48,161 +72,720 @@ app.add_middleware(
 
 class SearchResponse(BaseModel):
     results: list[dict]
+    tier: str | None = None
 
 class ManualSearchRequest(BaseModel):
     query: str
+    tier: str | None = None
+    deadline_ms: int | None = None
+    compact: bool | None = None
 
-class ToolCallArguments(BaseModel):
+class ConcernSearchRequest(BaseModel):
     query: str
+    k: int = 5
+    nprobe: int | None = None
+
+class ToolCallArguments(BaseModel):
+    query: str | None = None
+    tier: str | None = None
+    deadline_ms: int | None = None
+    compact: bool | None = None
+    # Snippet id from an earlier compact result, to fetch its full details instead of searching
+    expand: str | None = None
+
+class ToolCallFunction(BaseModel):
+    name: str | None = None
+    # Validated per tool call (see parse_arguments), so one malformed call doesn't reject the whole body
+    arguments: dict = {}
+
+    @field_validator("arguments", mode="before")
+    @classmethod
+    def decode_arguments(cls, value):
+        # OpenAI-style tool calls send arguments as a JSON-encoded string
+        if isinstance(value, (str, bytes)):
+            try:
+                value = orjson.loads(value)
+            except orjson.JSONDecodeError as e:
+                logger.warning(f"Could not parse arguments JSON: {e}")
+                return {}
+        return value if isinstance(value, dict) else {}
 
 class ToolCall(BaseModel):
-    id: str
-    arguments: ToolCallArguments
+    id: str | None = None
+    function: ToolCallFunction | None = None
+
+class Call(BaseModel):
+    id: str | None = None
 
 class Message(BaseModel):
-    toolCallList: List[ToolCall]
+    toolCalls: List[ToolCall] | None = None
+    toolCallList: List[ToolCall] | None = None
+    call: Call | None = None
+
+    @property
+    def tool_calls(self) -> List[ToolCall]:
+        return (self.toolCalls if self.toolCalls is not None else self.toolCallList) or []
 
 class SearchToolRequest(BaseModel):
-    message: Message
+    """Vapi webhook body: ``message.toolCalls`` / ``message.toolCallList``, or a bare ``query``."""
+    model_config = ConfigDict(extra="ignore")
+
+    message: Message | None = None
+    query: str | None = None
+    toolCallId: str | None = None
+    tier: str | None = None
+    deadline_ms: int | None = None
+    compact: bool | None = None
 
 class SearchToolResult(BaseModel):
-    toolCallId: str
-    result: List[dict]
+    toolCallId: str | None
+    result: List[dict] | None = None
+    tier: str | None = None
+    error: str | None = None
 
 class SearchToolResponse(BaseModel):
     results: List[SearchToolResult]
 
-# --- Graphiti client (initialized on startup) ---
+# --- Graphiti client and local index (initialized on startup) ---
+# graphiti_core is imported on startup rather than at import time; benchmarks swap in a stub class here
+Graphiti = None
 graphiti = None
+embedding_cache = None
+node_search_config = None
+search_recipes = []
+# Config fingerprint per recipe name, so per-request cache keys don't re-serialise the configs
+recipe_fingerprints = {}
+local_index = None
+attribute_index = None
+concerns_index = None
+prefetcher = None
+# Local copy of the procedures graph, re-read when ingestion exports a new one
+graph_snapshots = SnapshotStore()
+answer_snippets = SnippetStore()
+startup_report = StartupReport(IMPORT_STARTED)
+warmup_task = None
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger("webhook-search")
 
+def load_graphiti():
+    """Import graphiti_core and build the search recipe ladder (deferred from module import)."""
+    global Graphiti, node_search_config, search_recipes, recipe_fingerprints
+    if Graphiti is None:
+        from graphiti_core import Graphiti
+    if node_search_config is None:
+        from graphiti_core.search import search_config_recipes
+        node_search_config = search_config_recipes.NODE_HYBRID_SEARCH_RRF.model_copy(deep=True)
+        node_search_config.limit = NODE_SEARCH_LIMIT
+        search_recipes = []
+        for name in SEARCH_RECIPES:
+            recipe = getattr(search_config_recipes, name, None)
+            if recipe is None:
+                logger.warning(f"Unknown search recipe '{name}' in SEARCH_RECIPES, skipping.")
+                continue
+            config = recipe.model_copy(deep=True)
+            config.limit = NODE_SEARCH_LIMIT
+            search_recipes.append((name.lower(), config))
+        if not search_recipes:
+            search_recipes = [("node_hybrid_search_rrf", node_search_config)]
+        recipe_fingerprints = {name: config_fingerprint(config) for name, config in search_recipes}
+
+def known_attributes(name: str) -> dict:
+    """Cost / recovery / results text for a procedure from the attribute index, for prefetched context."""
+    record = attribute_index.lookup(name) if attribute_index else None
+    if not record:
+        return {}
+    return {k: record[k] for k in ("procedure_type", "cost_raw", "recovery_time", "results_duration") if record.get(k)}
+
+def is_procedure(name: str) -> bool:
+    """Whether a search result names a procedure; everything counts as one until the attribute index is loaded."""
+    return attribute_index is None or attribute_index.lookup(name) is not None
+
+async def warm_start():
+    """Build clients and indexes, then pre-open the Neo4j pool and run warm-up searches."""
+    global graphiti, embedding_cache, local_index, attribute_index, concerns_index, prefetcher
+    # Blocking loads run in a thread so a background warm start doesn't stall the event loop
+    with startup_report.stage("graphiti_import"):
+        await asyncio.to_thread(load_graphiti)
+    with startup_report.stage("graphiti_client"):
+        graphiti = Graphiti(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+        # Cache under the timing wrapper, so the embed stage reflects cache hits
+        embedding_cache = install_embedding_cache(graphiti)
+        metrics.instrument_graphiti(graphiti)
+        if PREFETCH_ENABLED and graphiti.driver is not None:
+            prefetcher = Prefetcher(
+                functools.partial(fetch_neighbours, graphiti.driver), enrich=known_attributes, is_procedure=is_procedure
+            )
+    # await graphiti.build_indices_and_constraints()
+    with startup_report.stage("concerns_index"):
+        try:
+            concerns_index = await asyncio.to_thread(ConcernsIndex, CONCERNS_INDEX_DIR)
+            logger.info(f"Concerns index loaded with {len(concerns_index)} chunks.")
+        except FileNotFoundError:
+            logger.warning(f"'{CONCERNS_INDEX_DIR}' not found; run build_concerns_index.py to enable /concerns-search.")
+    with startup_report.stage("local_index"):
+        try:
+            local_index = await asyncio.to_thread(LocalSearchIndex.from_docs, LOCAL_SEARCH_DOCS_DIR)
+            attribute_index = await asyncio.to_thread(AttributeIndex.from_docs, LOCAL_SEARCH_DOCS_DIR)
+        except FileNotFoundError:
+            logger.warning(f"'{LOCAL_SEARCH_DOCS_DIR}' not found; fast search tier and attribute index disabled.")
+    with startup_report.stage("answer_snippets"):
+        try:
+            if not await asyncio.to_thread(answer_snippets.reload):
+                logger.warning(
+                    f"'{answer_snippets.path}' not found; run answer_snippets.py for compact responses to use snippets."
+                )
+        except Exception as e:
+            # A corrupt snippets file only costs compact answers, not startup
+            startup_report.fail("answer_snippets", e)
+            logger.warning(f"Could not load '{answer_snippets.path}', compact responses will not use snippets: {e}")
+    with startup_report.stage("graph_snapshot"):
+        if not await asyncio.to_thread(graph_snapshots.reload):
+            logger.warning(f"'{graph_snapshots.path}' not found; run export_graph_snapshot.py to enable /graph queries.")
+    if local_index is not None:
+        with startup_report.stage("local_embeddings"):
+            try:
+                await local_index.embed(graphiti.embedder)
+            except Exception as e:
+                startup_report.fail("local_embeddings", e)
+                logger.warning(f"Local search embeddings unavailable, fast tier will use BM25 only: {e}")
+        logger.info(f"Local search index ready with {len(local_index)} procedures.")
+
+    if WARM_START_MODE != "off":
+        with startup_report.stage("neo4j_pool"):
+            try:
+                opened = await warmup.warm_driver_pool(graphiti.driver)
+                logger.info(f"Opened {opened} Neo4j connections.")
+            except Exception as e:
+                startup_report.fail("neo4j_pool", e)
+        with startup_report.stage("warmup_queries"), metrics.track_request("warmup"):
+            try:
+                succeeded = await warmup.run_warmup_queries(
+                    lambda q: graphiti._search(query=q, config=node_search_config, group_ids=PROCEDURE_GROUP_IDS)
+                )
+                if succeeded < len(warmup.WARMUP_QUERIES):
+                    startup_report.fail("warmup_queries", RuntimeError(
+                        f"{len(warmup.WARMUP_QUERIES) - succeeded} of {len(warmup.WARMUP_QUERIES)} queries failed"
+                    ))
+            except Exception as e:
+                startup_report.fail("warmup_queries", e)
+    startup_report.finish()
+
+async def warm_start_in_background():
+    try:
+        await warm_start()
+    except Exception as e:
+        startup_report.fail("startup", e)
+        logger.exception(f"Warm start failed: {e}")
+
 @app.on_event("startup")
 async def startup_event():
-    global graphiti
-    graphiti = Graphiti(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
-    # await graphiti.build_indices_and_constraints()
+    global warmup_task
+    startup_report.record("imports", time.perf_counter() - IMPORT_STARTED)
+    if WARM_START_MODE == "background":
+        warmup_task = asyncio.create_task(warm_start_in_background())
+    else:
+        await warm_start()
+
+def require_warm():
+    """503 while a background warm start is still running."""
+    if warmup_task is not None and not warmup_task.done():
+        raise HTTPException(status_code=503, detail="Warming up.", headers={"Retry-After": "1"})
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    global graphiti
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    if prefetcher:
+        # Before the driver closes under them
+        await prefetcher.close()
+    if embedding_cache:
+        await embedding_cache.close()
+    if shared_cache:
+        shared_cache.close()
     if graphiti:
         await graphiti.close()
+    if metrics.MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
 
-node_search_config =  NODE_HYBRID_SEARCH_RRF.model_copy(deep=True)
-node_search_config.limit = 5
+search_cache = SearchCache()
+# Hot answers shared by all worker processes on the host (see serve.py)
+shared_cache = SharedSearchCache(SEARCH_SHARED_CACHE_DIR) if SEARCH_SHARED_CACHE_DIR else None
+search_flights = SingleFlight()
+search_latency = LatencyEstimates()
+PROCEDURE_GROUP_IDS = ["procedures"]
 
 
-@app.post("/search-manual", response_model=SearchResponse)
-async def search_manual_endpoint(req: ManualSearchRequest):
-    query = req.query
-    if not query:
-        raise HTTPException(status_code=400, detail="'query' is required.")
-    try:
+class CacheInvalidateRequest(BaseModel):
+    group_id: str | None = None
+
+
+def extract_node_results(results) -> list[dict]:
+    # Extract only the nodes
+    return [
+        {"name": node.name, "group_id": node.group_id, "summary": node.summary}
+        for node in results.nodes
+    ]
+
+
+def sync_shared_generation():
+    if shared_cache is not None and shared_cache.changed():
+        # Another worker was told to invalidate; this process's entries may be stale too
+        search_cache.invalidate()
+
+
+def cache_get(key: tuple, check_generation: bool = True):
+    """This process's cache first, then the host-wide shared cache (copied into this process on a hit).
+
+    Callers looking up several keys at once check the shared generation themselves, once.
+    """
+    if check_generation:
+        sync_shared_generation()
+    cached = search_cache.get(key)
+    if cached is None and shared_cache is not None:
+        cached = shared_cache.get(key)
+        if cached is not None:
+            search_cache.set(key, cached)
+    return cached
+
+
+async def cached_node_search(query: str, group_ids: list[str] = PROCEDURE_GROUP_IDS, config=None) -> list[dict]:
+    config = config or node_search_config
+    with metrics.stage("cache_lookup"):
+        key = search_cache.make_key(query, group_ids, config)
+        cached = cache_get(key)
+    if cached is not None:
+        return cached
+    # Identical searches already in flight share one graph search instead of each starting their own
+    results, joined = await search_flights.do(key, uncached_node_search, query, group_ids, key, config)
+    if joined:
+        metrics.record_coalesced()
+    return results
+
+
+async def uncached_node_search(query: str, group_ids: list[str], key: tuple, config) -> list[dict]:
+    embedding = None
+    if search_cache.max_distance > 0:
+        embedding = await graphiti.embedder.create(input_data=[query.replace("\n", " ")])
+        cached = search_cache.get_similar(key, embedding)
+        if cached is not None:
+            # Stored under this phrasing too, so its repeats hit the exact key without embedding again
+            search_cache.set(key, cached, embedding)
+            return cached
+
+    search_cache.record_miss()
+    with metrics.graph_search_stage():
         results = await graphiti._search(
             query=query,
-            config=node_search_config,
-            group_ids=["procedures"]
+            config=config,
+            group_ids=group_ids
         )
-        # Extract only the nodes
-        nodes = []
-        for label, items in results:
-            if label == "nodes":
-                nodes = items
-                break
-        filtered = [
-            {
-                "name": getattr(node, "name", None),
-                "group_id": getattr(node, "group_id", None),
-                "summary": getattr(node, "summary", None)
-            }
-            for node in nodes
-        ]
-        return {"results": filtered}
+    filtered = extract_node_results(results)
+    search_cache.set(key, filtered, embedding)
+    if shared_cache is not None:
+        shared_cache.set(key, filtered)
+    return filtered
+
+
+async def local_node_search(query: str) -> list[dict]:
+    query_embedding = None
+    if local_index.embeddings is not None:
+        try:
+            query_embedding = await graphiti.embedder.create(input_data=[query.replace("\n", " ")])
+        except Exception as e:
+            logger.warning(f"Query embedding failed, fast tier falling back to BM25: {e}")
+    with metrics.stage("local_search"):
+        return local_index.search(query, query_embedding, limit=NODE_SEARCH_LIMIT)
+
+
+async def snapshot_node_search(query: str) -> list[dict] | None:
+    """Nearest nodes in the local graph snapshot; answers while Neo4j is unreachable."""
+    snapshot = graph_snapshots.get()
+    if snapshot is None:
+        return None
+    query_embedding = await graphiti.embedder.create(input_data=[query.replace("\n", " ")])
+    with metrics.stage("snapshot_search"):
+        nodes = snapshot.search(query_embedding, k=NODE_SEARCH_LIMIT)
+    return [{"name": n["name"], "group_id": n["group_id"], "summary": n["summary"]} for n in nodes] or None
+
+
+async def graph_node_search(query: str, config) -> list[dict]:
+    try:
+        return await cached_node_search(query, config=config)
+    except (ServiceUnavailable, SessionExpired):
+        metrics.record_error("neo4j_unavailable")
+        raise
+
+
+async def search_nodes(query: str, tier: str | None = None,
+                       deadline_ms: int = MANUAL_DEADLINE_MS) -> tuple[list[dict], str]:
+    """Best answer available within ``deadline_ms``; returns ``(results, answering tier)``.
+
+    The graph tier tries the configured recipes richest first, then the last
+    cached answer for the query, then the local index (embedding + BM25, then
+    BM25 alone). Recipes that won't fit in the remaining budget are skipped.
+    """
+    tier = tier or SEARCH_DEFAULT_TIER
+    if tier == "fast" and local_index is not None:
+        metrics.record_tier("fast")
+        return await local_node_search(query), "fast"
+
+    # An already cached recipe answers at no cost, so check them richest first before budgeting
+    with metrics.stage("cache_lookup"):
+        sync_shared_generation()
+        for name, config in search_recipes:
+            key = search_cache.make_key(query, PROCEDURE_GROUP_IDS, config, recipe_fingerprints.get(name))
+            cached = cache_get(key, check_generation=False)
+            if cached is not None:
+                metrics.record_tier(name)
+                return cached, name
+
+    async def stale_answer():
+        return search_cache.last_answer(search_cache.make_key(query, PROCEDURE_GROUP_IDS, node_search_config))
+
+    async def keyword_answer():
+        return local_index.search(query, None, limit=NODE_SEARCH_LIMIT)
+
+    tiers = [Tier(name, functools.partial(graph_node_search, query, config)) for name, config in search_recipes]
+    tiers.append(Tier("stale_cache", stale_answer, instant=True))
+    tiers.append(Tier("snapshot", functools.partial(snapshot_node_search, query)))
+    if local_index is not None:
+        tiers.append(Tier("fast", functools.partial(local_node_search, query)))
+        tiers.append(Tier("keyword", keyword_answer, instant=True))
+    results, answered = await search_with_deadline(tiers, deadline_ms / 1000, search_latency)
+    if answered != search_recipes[0][0]:
+        logger.info(f"Search answered by fallback tier {answered}", extra={"tier": answered})
+    metrics.record_tier(answered)
+    return results, answered
+
+
+async def run_tool_call(tool_call_id: str | None, arguments: ToolCallArguments,
+                        semaphore: asyncio.Semaphore, call_id: str | None = None) -> dict:
+    """Run one tool call's search; failures are reported in its own result entry.
+
+    Follow-ups within a Vapi call are answered from context prefetched after
+    earlier searches in that call when they match it. ``compact`` results carry
+    snippet ids that a later call can ``expand``.
+    """
+    if arguments.expand:
+        expanded = expand_snippet(arguments.expand)
+        if expanded is None:
+            metrics.record_error("unknown_snippet")
+            return {"toolCallId": tool_call_id, "error": f"No procedure with id '{arguments.expand}'."}
+        return {"toolCallId": tool_call_id, "result": [expanded], "tier": "snippets"}
+    if not arguments.query:
+        metrics.record_error("missing_query")
+        return {"toolCallId": tool_call_id, "error": "No query found in tool call arguments."}
+    # The search's own deadline never outlives the hard per-call timeout
+    deadline_ms = min(arguments.deadline_ms or WEBHOOK_DEADLINE_MS, int(WEBHOOK_TOOL_CALL_TIMEOUT * 1000))
+    try:
+        # A caller asking for a particular tier gets that tier's answer, not the prefetched context
+        use_prefetch = prefetcher is not None and arguments.tier is None
+        filtered = prefetcher.answer(call_id, arguments.query, NODE_SEARCH_LIMIT) if use_prefetch else None
+        if filtered is not None:
+            tier = "prefetch"
+            metrics.record_tier(tier)
+        else:
+            async with semaphore:
+                filtered, tier = await asyncio.wait_for(
+                    search_nodes(arguments.query, arguments.tier, deadline_ms), timeout=WEBHOOK_TOOL_CALL_TIMEOUT
+                )
+            if prefetcher:
+                prefetcher.schedule(call_id, filtered)
+    except asyncio.TimeoutError:
+        logger.error(f"Search timed out after {deadline_ms}ms for toolCallId {tool_call_id}")
+        metrics.record_error("timeout")
+        return {"toolCallId": tool_call_id, "error": "Search timed out."}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Search failed: {e}")
+        logger.error(f"Search failed for toolCallId {tool_call_id}: {e}")
+        metrics.record_error(type(e).__name__)
+        return {"toolCallId": tool_call_id, "error": f"Search failed: {e}"}
+    metrics.record_results(len(filtered))
+    if arguments.compact if arguments.compact is not None else RESPONSE_COMPACT:
+        with metrics.stage("compact"):
+            filtered = answer_snippets.compact(filtered)
+    logger.info("Returning results", extra={"toolCallId": tool_call_id, "result_count": len(filtered), "tier": tier})
+    if payload_sampled():
+        logger.info("Results", extra={"toolCallId": tool_call_id, "results": redact(filtered)})
+    return {"toolCallId": tool_call_id, "result": filtered, "tier": tier}
 
-@app.post("/webhook-search")
-async def webhook_search(request: Request):
+
+def expand_snippet(snippet_id: str) -> dict | None:
+    """Full details behind a compact result: the snippet, the record's docs_kb fields and parsed attributes."""
+    entry = answer_snippets.get(snippet_id)
+    if entry is None:
+        return None
+    return {**entry, "attributes": known_attributes(entry["name"])}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 with the startup breakdown once warm start has finished, 503 before."""
+    report = startup_report.as_dict()
+    return ORJSONResponse(report, status_code=200 if startup_report.ready else 503)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    if metrics.MULTIPROCESS:
+        # Aggregate every worker's samples, not just the one answering this scrape
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    stats = search_cache.stats()
+    stats["single_flight"] = search_flights.stats()
+    if prefetcher:
+        stats["prefetch"] = prefetcher.stats()
+    if embedding_cache:
+        stats["embeddings"] = embedding_cache.stats()
+    if shared_cache:
+        stats["shared"] = shared_cache.stats()
+    stats["graph_snapshot"] = graph_snapshots.stats()
+    stats["pid"] = os.getpid()
+    return stats
+
+
+@app.post("/cache/invalidate")
+async def cache_invalidate(req: CacheInvalidateRequest, authorization: str | None = Header(None)):
+    # Flushing every cache is expensive for everyone, so only holders of CACHE_ADMIN_TOKEN may do it
+    if not CACHE_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Cache invalidation is disabled; set CACHE_ADMIN_TOKEN.")
+    if not hmac.compare_digest(authorization or "", f"Bearer {CACHE_ADMIN_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid or missing cache admin token.")
+    removed = search_cache.invalidate(req.group_id)
+    if shared_cache:
+        # Only one worker receives this request; the generation bump reaches the others
+        shared_cache.invalidate()
+    return {"invalidated": removed}
+
+
+@app.get("/procedures/filter")
+async def filter_procedures(
+    max_cost: float | None = None,
+    min_cost: float | None = None,
+    max_recovery_days: float | None = None,
+    min_results_days: float | None = None,
+    procedure_type: str | None = None,
+    sort_by: str = Query("cost", pattern="^(cost|recovery|results)$"),
+    descending: bool = False,
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Structured price/downtime lookup, e.g. ?max_cost=2000&max_recovery_days=7."""
+    if attribute_index is None:
+        raise HTTPException(status_code=503, detail="Attribute index is not loaded.")
+    results = attribute_index.filter(
+        max_cost=max_cost,
+        min_cost=min_cost,
+        max_recovery_days=max_recovery_days,
+        min_results_days=min_results_days,
+        procedure_type=procedure_type,
+        sort_by=sort_by,
+        descending=descending,
+        limit=limit,
+    )
+    return {"results": results}
+
+
+@app.get("/procedures/attributes")
+async def procedure_attributes(name: str):
+    if attribute_index is None:
+        raise HTTPException(status_code=503, detail="Attribute index is not loaded.")
+    record = attribute_index.lookup(name)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"No procedure named '{name}'.")
+    return record
+
+
+def require_snapshot():
+    snapshot = graph_snapshots.get()
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Graph snapshot is not loaded.")
+    return snapshot
+
+
+@app.get("/graph/procedures")
+async def graph_procedures(
+    treats: List[str] = Query([]),
+    accepts: List[str] = Query([]),
+    referral_from: List[str] = Query([]),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Procedures linked to every given neighbour, e.g. ?treats=Lips&accepts=AfterPay."""
+    snapshot = require_snapshot()
+    constraints = (
+        [("TREATS_AREA", name) for name in treats]
+        + [("ACCEPTS_PAYMENT", name) for name in accepts]
+        + [("REQUIRES_REFERRAL", name) for name in referral_from]
+    )
+    if not constraints:
+        raise HTTPException(status_code=400, detail="Give at least one of treats, accepts or referral_from.")
     try:
-        payload = await request.json()
-        logger.info(f"Received events: {payload}")
-        query = None
-        tool_call_id = None
+        return {"results": snapshot.connected_to_all(constraints, limit=limit)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/graph/traverse")
+async def graph_traverse(
+    name: str,
+    path: str = Query(..., description="Comma-separated edge types; prefix with ~ to follow an edge backwards"),
+    label: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Multi-hop lookup, e.g. ?name=Lip Filler&path=TREATS_AREA,~TREATS_AREA for procedures on the same areas."""
+    snapshot = require_snapshot()
+    if not snapshot.find(name):
+        raise HTTPException(status_code=404, detail=f"No node named '{name}'.")
+    try:
+        results = snapshot.traverse(name, [p.strip() for p in path.split(",") if p.strip()], label=label, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results}
+
 
-        # Try to extract from OpenAI tool-calls format (toolCalls or toolCallList)
+@app.get("/graph/node")
+async def graph_node(name: str):
+    """A node with the facts on its outgoing edges."""
+    snapshot = require_snapshot()
+    ids = snapshot.find(name)
+    if not ids:
+        raise HTTPException(status_code=404, detail=f"No node named '{name}'.")
+    node = snapshot.node(ids[0])
+    node["edges"] = [fact for edge_type in sorted(snapshot.edge_types) for fact in snapshot.facts(ids[0], edge_type)]
+    return node
+
+
+@app.get("/snippets/{snippet_id}")
+async def get_snippet(snippet_id: str):
+    """Expand a compact search result by its id."""
+    expanded = expand_snippet(snippet_id)
+    if expanded is None:
+        raise HTTPException(status_code=404, detail=f"No procedure with id '{snippet_id}'.")
+    return expanded
+
+
+@app.post("/concerns-search", response_model=SearchResponse)
+async def concerns_search(req: ConcernSearchRequest):
+    require_warm()
+    if not req.query:
+        raise HTTPException(status_code=400, detail="'query' is required.")
+    if concerns_index is None:
+        raise HTTPException(status_code=503, detail="Concerns index is not loaded.")
+    try:
+        query_embedding = await graphiti.embedder.create(input_data=[req.query.replace("\n", " ")])
+        nprobe = req.nprobe if req.nprobe is not None else CONCERNS_NPROBE
+        return {"results": concerns_index.search(query_embedding, k=req.k, nprobe=nprobe)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Concerns search failed: {e}")
+
+
+@app.post("/search-manual", response_model=SearchResponse)
+async def search_manual_endpoint(req: ManualSearchRequest):
+    require_warm()
+    with metrics.track_request("search_manual"):
+        query = req.query
+        if not query:
+            metrics.record_error("missing_query")
+            raise HTTPException(status_code=400, detail="'query' is required.")
         try:
-            # Try toolCalls (list of dicts)
-            tool_calls = None
-            if "message" in payload:
-                if "toolCalls" in payload["message"]:
-                    tool_calls = payload["message"]["toolCalls"]
-                elif "toolCallList" in payload["message"]:
-                    tool_calls = payload["message"]["toolCallList"]
-            if tool_calls and len(tool_calls) > 0:
-                tool_call = tool_calls[0]
-                tool_call_id = tool_call.get("id")
-                function = tool_call.get("function")
-                if function:
-                    arguments = function.get("arguments")
-                    if isinstance(arguments, str):
-                        import json as _json
-                        try:
-                            arguments = _json.loads(arguments)
-                        except Exception as e:
-                            logger.warning(f"Could not parse arguments JSON: {e}")
-                    if isinstance(arguments, dict):
-                        query = arguments.get("query")
+            filtered, tier = await search_nodes(query, req.tier, req.deadline_ms or MANUAL_DEADLINE_MS)
+        except asyncio.TimeoutError as e:
+            metrics.record_error("timeout")
+            raise HTTPException(status_code=504, detail=f"Search timed out: {e}")
         except Exception as e:
-            logger.warning(f"Could not extract query from toolCalls/toolCallList: {e}")
+            metrics.record_error(type(e).__name__)
+            raise HTTPException(status_code=500, detail=f"Search failed: {e}")
+        metrics.record_results(len(filtered))
+        if req.compact if req.compact is not None else RESPONSE_COMPACT:
+            filtered = answer_snippets.compact(filtered)
+        with metrics.stage("serialize"):
+            return ORJSONResponse({"results": filtered, "tier": tier})
 
-        # Fallback: direct query field
-        if not query:
-            query = payload.get("query")
-        if not tool_call_id:
-            tool_call_id = payload.get("toolCallId")
+@app.post("/webhook-search")
+async def webhook_search(
+    request: Request,
+    # Defaults for tool calls that don't set their own
+    tier: str | None = Query(None),
+    deadline_ms: int | None = Query(None, ge=1),
+    compact: bool | None = Query(None),
+):
+    require_warm()
+    with metrics.track_request("webhook_search"):
+        return await handle_webhook_search(request, tier, deadline_ms, compact)
 
-        if not query:
-            logger.error("No query found in webhook payload.")
-            return {"error": "No query found in webhook payload."}
+def parse_arguments(raw: dict) -> tuple[ToolCallArguments | None, str | None]:
+    """One tool call's arguments, or the validation error to report under its toolCallId."""
+    try:
+        return ToolCallArguments.model_validate(raw), None
+    except ValidationError as e:
+        problems = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors(include_url=False))
+        return None, f"Invalid tool call arguments: {problems}"
+
+
+async def handle_webhook_search(request: Request, default_tier: str | None = None,
+                                default_deadline_ms: int | None = None, default_compact: bool | None = None):
+    try:
+        with metrics.stage("parse"):
+            body = await request.body()
+            payload = SearchToolRequest.model_validate_json(body)
+        if sample_payload():
+            logger.info("Received webhook payload", extra={"payload": redact(orjson.loads(body))})
+
+        # OpenAI tool-calls format (toolCalls or toolCallList)
+        if default_compact is None:
+            default_compact = payload.compact
+        call_id = payload.message.call.id if payload.message and payload.message.call else None
+        # (toolCallId, arguments, error): a call whose arguments don't validate gets its own error result
+        calls = []
+        for tool_call in payload.message.tool_calls if payload.message else []:
+            arguments, error = parse_arguments(tool_call.function.arguments if tool_call.function else {})
+            if error:
+                logger.warning(f"Invalid arguments for toolCallId {tool_call.id}: {error}")
+                metrics.record_error("invalid_arguments")
+            calls.append((tool_call.id, arguments, error))
 
-        logger.info(f"Extracted toolCallId: {tool_call_id}, query: {query}")
+        # Fallback: direct query field
+        if not any(error or arguments.query or arguments.expand for _, arguments, error in calls):
+            if not payload.query:
+                logger.error("No query found in webhook payload.")
+                metrics.record_error("missing_query")
+                return {"error": "No query found in webhook payload."}
+            tool_call_id = calls[0][0] if calls else None
+            arguments = ToolCallArguments(query=payload.query, tier=payload.tier, deadline_ms=payload.deadline_ms)
+            calls = [(tool_call_id or payload.toolCallId, arguments, None)]
+        for _, arguments, error in calls:
+            if error:
+                continue
+            arguments.tier = arguments.tier or default_tier
+            arguments.deadline_ms = arguments.deadline_ms or default_deadline_ms
+            if arguments.compact is None:
+                arguments.compact = default_compact
+
+        logger.info("Extracted tool calls", extra={
+            "tool_call_count": len(calls),
+            "tool_call_ids": [tool_call_id for tool_call_id, _, _ in calls],
+        })
+    except ValidationError as e:
+        logger.warning(f"Invalid webhook payload: {e.error_count()} validation error(s)")
+        metrics.record_error("invalid_payload")
+        raise HTTPException(status_code=400, detail=f"Invalid webhook format: {e.errors(include_url=False, include_input=False)}")
     except Exception as e:
         logger.exception(f"Error parsing webhook payload: {e}")
+        metrics.record_error("invalid_payload")
         raise HTTPException(status_code=400, detail=f"Invalid webhook format: {e}")
 
-    try:
-        results = await graphiti._search(
-            query=query,
-            config=node_search_config,
-            group_ids=["procedures"]
-        )
-        # Extract only the nodes
-        nodes = []
-        for label, items in results:
-            if label == "nodes":
-                nodes = items
-                break
-        filtered = [
-            {
-                "name": getattr(node, "name", None),
-                "group_id": getattr(node, "group_id", None),
-                "summary": getattr(node, "summary", None)
-            }
-            for node in nodes
-        ]
-        logger.info(f"Returning {len(filtered)} results for toolCallId {tool_call_id}")
-        logger.info(f"Results: {filtered}")
-        return {
-            "results": [
-                {
-                    "toolCallId": tool_call_id,
-                    "result": filtered
-                }
-            ]
-        }
-    except Exception as e:
-        logger.error(f"Search failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Search failed: {e}")
+    semaphore = asyncio.Semaphore(WEBHOOK_MAX_CONCURRENCY)
+    async def invalid_call(tool_call_id, error):
+        return {"toolCallId": tool_call_id, "error": error}
 
+    results = await asyncio.gather(*[
+        invalid_call(tool_call_id, error) if error else run_tool_call(tool_call_id, arguments, semaphore, call_id)
+        for tool_call_id, arguments, error in calls
+    ])
+    with metrics.stage("serialize"):
+        return ORJSONResponse({"results": list(results)})
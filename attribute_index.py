@@ -0,0 +1,160 @@
+import math
+import re
+
+import numpy as np
+
+from generate_procedures_md import DOCS_DIR
+from local_search import load_procedure_records
+
+_MONEY = re.compile(r"\$\s*(\d[\d,]*(?:\.\d+)?)\s*(k\b)?", re.IGNORECASE)
+
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "couple": 2, "few": 3, "several": 4,
+}
+_UNIT_DAYS = {"hour": 1 / 24, "day": 1, "night": 1, "week": 7, "month": 30, "year": 365}
+_NUM = r"(\d+(?:\.\d+)?|" + "|".join(_NUMBER_WORDS) + r")"
+_DURATION = re.compile(
+    r"\b" + _NUM + r"(?:\s*(?:-|–|to|or)\s*" + _NUM + r")?\s*(?:of\s+)?(hour|day|night|week|month|year)s?",
+    re.IGNORECASE,
+)
+_NO_DOWNTIME = re.compile(r"\b(no|zero|minimal|little)\s+(down\s*time|downtime|recovery)\b|\bimmediate(ly)?\b", re.IGNORECASE)
+
+
+def _number(token: str) -> float:
+    token = token.lower()
+    return float(_NUMBER_WORDS[token]) if token in _NUMBER_WORDS else float(token)
+
+
+def parse_cost(text: str | None) -> tuple[float | None, float | None]:
+    """Numeric ``(min, max)`` dollars from strings like 'From $5,500' or '$300 - $600'.
+
+    'From'/'starting' prices have an open upper bound (``None``).
+    """
+    if not text:
+        return None, None
+    amounts = []
+    for value, thousands in _MONEY.findall(text):
+        amount = float(value.replace(",", ""))
+        amounts.append(amount * 1000 if thousands else amount)
+    if not amounts:
+        return None, None
+    low = min(amounts)
+    if len(amounts) == 1 and re.search(r"\b(from|starting|start|upwards)\b", text, re.IGNORECASE):
+        return low, None
+    return low, max(amounts)
+
+
+def parse_duration_days(text: str | None) -> tuple[float | None, float | None]:
+    """``(min, max)`` days from the first duration phrase, e.g. 'one to two weeks' -> (7, 14)."""
+    if not text:
+        return None, None
+    match = _DURATION.search(text)
+    if match:
+        low, high, unit = match.groups()
+        days = _UNIT_DAYS[unit.lower()]
+        low_days = _number(low) * days
+        high_days = _number(high) * days if high else low_days
+        return low_days, high_days
+    if _NO_DOWNTIME.search(text):
+        return 0.0, 0.0
+    return None, None
+
+
+def procedure_attributes(procedure: dict) -> dict:
+    cost_min, cost_max = parse_cost(procedure.get("cost"))
+    recovery_min, recovery_max = parse_duration_days(procedure.get("recovery_time"))
+    results_min, results_max = parse_duration_days(procedure.get("results_duration"))
+    return {
+        "name": procedure.get("procedure_name"),
+        "procedure_type": procedure.get("procedure_type"),
+        "cost_raw": procedure.get("cost"),
+        "cost_min": cost_min,
+        "cost_max": cost_max,
+        "recovery_time": procedure.get("recovery_time"),
+        "recovery_min_days": recovery_min,
+        "recovery_max_days": recovery_max,
+        "results_duration": procedure.get("results_duration"),
+        "results_min_days": results_min,
+        "results_max_days": results_max,
+    }
+
+
+def _column(values) -> np.ndarray:
+    return np.array([math.nan if v is None else v for v in values], dtype=np.float64)
+
+
+class AttributeIndex:
+    """Precomputed numeric cost / recovery / results-duration columns for structured filtering.
+
+    Unknown values are NaN and never match a bound on that attribute.
+    """
+
+    SORT_KEYS = {
+        "cost": "cost_min",
+        "recovery": "recovery_max_days",
+        "results": "results_max_days",
+    }
+
+    def __init__(self, records: list[dict]):
+        self.records = records
+        self._by_name = {(r["name"] or "").strip().lower(): r for r in records}
+        self.cost_min = _column(r["cost_min"] for r in records)
+        # Upper bounds fall back to the lower bound when the text gave a single value
+        self.recovery_max_days = _column(
+            r["recovery_max_days"] if r["recovery_max_days"] is not None else r["recovery_min_days"]
+            for r in records
+        )
+        self.results_max_days = _column(
+            r["results_max_days"] if r["results_max_days"] is not None else r["results_min_days"]
+            for r in records
+        )
+        self.procedure_type = np.array([(r["procedure_type"] or "").lower() for r in records], dtype=object)
+
+    @classmethod
+    def from_docs(cls, docs_dir: str = DOCS_DIR) -> "AttributeIndex":
+        return cls([procedure_attributes(p) for p, _ in load_procedure_records(docs_dir)])
+
+    def __len__(self):
+        return len(self.records)
+
+    def lookup(self, name: str) -> dict | None:
+        return self._by_name.get(name.strip().lower())
+
+    def filter(
+        self,
+        max_cost: float | None = None,
+        min_cost: float | None = None,
+        max_recovery_days: float | None = None,
+        min_results_days: float | None = None,
+        procedure_type: str | None = None,
+        sort_by: str = "cost",
+        descending: bool = False,
+        limit: int = 10,
+    ) -> list[dict]:
+        """Procedures matching every given bound, sorted by ``sort_by`` (cost, recovery or results)."""
+        mask = np.ones(len(self.records), dtype=bool)
+        # NaN comparisons are False, so records missing an attribute drop out of that filter
+        if max_cost is not None:
+            mask &= self.cost_min <= max_cost
+        if min_cost is not None:
+            mask &= self.cost_min >= min_cost
+        if max_recovery_days is not None:
+            mask &= self.recovery_max_days <= max_recovery_days
+        if min_results_days is not None:
+            mask &= self.results_max_days >= min_results_days
+        if procedure_type:
+            needle = procedure_type.lower()
+            mask &= np.array([needle in t for t in self.procedure_type], dtype=bool)
+
+        if sort_by not in self.SORT_KEYS:
+            raise ValueError(f"sort_by must be one of {sorted(self.SORT_KEYS)}")
+        column = getattr(self, self.SORT_KEYS[sort_by])
+        candidates = np.flatnonzero(mask)
+        keys = column[candidates]
+        if descending:
+            keys = -keys
+        # NaNs sort last either way
+        order = candidates[np.argsort(np.where(np.isnan(keys), np.inf, keys), kind="stable")]
+        return [self.records[i] for i in order[:limit]]
@@ -0,0 +1,83 @@
+"""Ingestion throughput of ingest_to_graphiti.main() against StubGraphiti.
+
+Runs in a scratch directory with synthetic docs_kb records so the real
+manifest file is untouched.
+
+    python -m benchmarks.bench_ingest --records 200 --workers 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import ingest_to_graphiti
+from benchmarks.stub_graphiti import StubGraphiti
+
+
+def write_records(docs_dir: str, count: int):
+    os.makedirs(docs_dir, exist_ok=True)
+    for i in range(count):
+        record = {
+            "json": {
+                "procedure_name": f"Benchmark Procedure {i}",
+                "explanation": "A synthetic procedure used for ingestion benchmarks. " * 5,
+                "treatment_overview": "Overview text. " * 10,
+                "procedure_type": "Non-Surgical",
+                "cost": f"From ${500 + i * 10:,}",
+                "recovery_time": "one to two weeks",
+                "results_duration": "3-6 months",
+                "miscellaneous_information": "Payment by Visa, Mastercard and AfterPay.",
+            },
+            "metadata": {"url": f"https://example.com/procedures/bench-{i}/"},
+        }
+        with open(os.path.join(docs_dir, f"{i}.json"), "w") as f:
+            json.dump(record, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=ingest_to_graphiti.INGEST_WORKERS)
+    parser.add_argument("--rate", type=float, default=0, help="INGEST_RATE_PER_SEC (0 = unlimited)")
+    parser.add_argument("--output", help="Results JSON path (default benchmarks/results/ingest-<timestamp>.json)")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output or os.path.join(
+        "benchmarks", "results", f"ingest-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    ))
+    ingest_to_graphiti.Graphiti = StubGraphiti
+    ingest_to_graphiti.INGEST_WORKERS = args.workers
+    ingest_to_graphiti.INGEST_RATE_PER_SEC = args.rate
+    ingest_to_graphiti.invalidate_remote_cache = lambda group_id: None
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        write_records(os.path.join(scratch, "docs_kb"), args.records)
+        os.chdir(scratch)
+        try:
+            start = time.perf_counter()
+            asyncio.run(ingest_to_graphiti.main())
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {"records": args.records, "workers": args.workers, "rate": args.rate,
+                   **{k: v for k, v in os.environ.items() if k.startswith("STUB_")}},
+        "elapsed_s": round(elapsed, 3),
+        "episodes_per_s": round(args.records / elapsed, 2),
+    }
+    print(f"Ingested {args.records} records with {args.workers} worker(s) in {elapsed:.2f}s "
+          f"({results['episodes_per_s']} episodes/s)")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Load-test /webhook-search and /search-manual.
+
+Without --url, starts ``benchmarks.serve_stub`` (app.py with a latency-configurable
+Graphiti stub, see STUB_* env vars) so server overhead can be measured without
+Neo4j or OpenAI. Results are written as JSON; pass --compare to diff with a
+previous run.
+
+    python -m benchmarks.bench_search --concurrency 50 --requests 2000
+    python -m benchmarks.bench_search --url http://localhost:8001 --endpoint webhook
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+QUERIES = [
+    "how much is a chemical peel",
+    "chemical peel price",
+    "what is the recovery time for breast augmentation",
+    "how long does botox last",
+    "do you offer lip fillers",
+    "can I pay with afterpay",
+    "rhinoplasty cost",
+    "is there downtime after laser resurfacing",
+    "what does a tummy tuck involve",
+    "do I need a referral for labiaplasty",
+]
+
+
+def vapi_payload(queries: list[str], call_id: str) -> dict:
+    """A Vapi tool-calls webhook with one toolCallList entry per query."""
+    tool_calls = [
+        {
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "function",
+            "function": {"name": "search_procedures", "arguments": {"query": q}},
+        }
+        for q in queries
+    ]
+    return {
+        "message": {
+            "type": "tool-calls",
+            "timestamp": int(time.time() * 1000),
+            "call": {"id": call_id},
+            "toolCallList": tool_calls,
+            "toolWithToolCallList": [
+                {"type": "function", "function": {"name": "search_procedures"}, "toolCall": tc}
+                for tc in tool_calls
+            ],
+        }
+    }
+
+
+def pick_queries(n: int, unique: bool) -> list[str]:
+    queries = random.choices(QUERIES, k=n)
+    if unique:
+        queries = [f"{q} {uuid.uuid4().hex[:6]}" for q in queries]
+    return queries
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    values = np.array(latencies) * 1000 if latencies else np.array([0.0])
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+async def run_load(base_url: str, endpoint: str, total: int, concurrency: int, tool_calls: int,
+                   unique: bool) -> dict:
+    path = "/webhook-search" if endpoint == "webhook" else "/search-manual"
+    latencies: list[float] = []
+    errors = 0
+    remaining = total
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                if endpoint == "webhook":
+                    body = vapi_payload(pick_queries(tool_calls, unique), f"bench-{uuid.uuid4().hex[:8]}")
+                else:
+                    body = {"query": pick_queries(1, unique)[0]}
+                start = time.perf_counter()
+                try:
+                    resp = await client.post(path, json=body)
+                    ok = resp.status_code == 200 and "error" not in resp.json()
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, errors, elapsed)
+
+
+def wait_until_up(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{base_url}/cache/stats", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Stub server at {base_url} did not start within {timeout}s")
+
+
+def compare(current: dict, previous_path: str):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\nCompared with {previous_path}:")
+    for endpoint, stats in current["endpoints"].items():
+        before = previous.get("endpoints", {}).get(endpoint)
+        if not before:
+            continue
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            delta = stats[key] - before[key]
+            pct = (delta / before[key] * 100) if before[key] else 0.0
+            print(f"  {endpoint:8s} {key:15s} {before[key]:>10.2f} -> {stats[key]:>10.2f} ({pct:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Benchmark a running server instead of starting the stub server")
+    parser.add_argument("--endpoint", choices=["webhook", "manual", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--tool-calls", type=int, default=1, help="toolCallList entries per webhook payload")
+    parser.add_argument("--unique-queries", action="store_true", help="Defeat the result cache with unique queries")
+    parser.add_argument("--port", type=int, default=8011, help="Port for the stub server")
+    parser.add_argument("--output", help="Results JSON path (default benchmarks/results/search-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen([sys.executable, "-m", "benchmarks.serve_stub", "--port", str(args.port)])
+    try:
+        wait_until_up(base_url)
+        endpoints = ["webhook", "manual"] if args.endpoint == "both" else [args.endpoint]
+        results = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "config": {
+                **{k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+                "target": base_url,
+                "stub": server is not None,
+                **({k: v for k, v in os.environ.items() if k.startswith("STUB_")} if server else {}),
+            },
+            "endpoints": {},
+        }
+        for endpoint in endpoints:
+            stats = asyncio.run(run_load(base_url, endpoint, args.requests, args.concurrency,
+                                         args.tool_calls, args.unique_queries))
+            results["endpoints"][endpoint] = stats
+            print(f"{endpoint:8s} {stats['throughput_rps']:>8.1f} req/s  p50 {stats['p50_ms']:.1f}ms  "
+                  f"p95 {stats['p95_ms']:.1f}ms  p99 {stats['p99_ms']:.1f}ms  errors {stats['errors']}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"search-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Run app.py under uvicorn with Graphiti replaced by StubGraphiti.
+
+    python -m benchmarks.serve_stub --port 8011
+
+The stub is patched into this process's ``app`` module, so it always serves
+from a single process.
+"""
+import argparse
+import functools
+import tempfile
+
+import uvicorn
+
+import app
+from benchmarks.stub_graphiti import StubGraphiti
+from embedding_cache import install_embedding_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    args = parser.parse_args()
+    app.Graphiti = StubGraphiti
+    # Fresh embedding cache per run, so results don't depend on earlier runs
+    scratch = tempfile.TemporaryDirectory(prefix="bench-embeddings-")
+    app.install_embedding_cache = functools.partial(install_embedding_cache, directory=scratch.name)
+    uvicorn.run(app.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
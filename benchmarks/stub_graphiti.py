@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import os
+import random
+from types import SimpleNamespace
+from uuid import uuid4
+
+import numpy as np
+
+# Simulated backend latencies in milliseconds (mean, +/- uniform jitter)
+STUB_EMBED_MS = float(os.environ.get('STUB_EMBED_MS', '80'))
+STUB_SEARCH_MS = float(os.environ.get('STUB_SEARCH_MS', '120'))
+STUB_ADD_EPISODE_MS = float(os.environ.get('STUB_ADD_EPISODE_MS', '500'))
+STUB_JITTER = float(os.environ.get('STUB_JITTER', '0.25'))
+STUB_EMBEDDING_DIM = 1024
+
+
+async def _sleep_ms(mean_ms: float):
+    if mean_ms > 0:
+        await asyncio.sleep(mean_ms * random.uniform(1 - STUB_JITTER, 1 + STUB_JITTER) / 1000)
+
+
+def fake_embedding(text: str) -> list[float]:
+    """Deterministic unit vector per text, so cache and similarity code paths behave realistically."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(STUB_EMBEDDING_DIM).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class StubEmbedder:
+    def __init__(self, latency_ms: float = STUB_EMBED_MS):
+        self.latency_ms = latency_ms
+        self.config = SimpleNamespace(embedding_model="stub-embedding")
+
+    async def create(self, input_data):
+        await _sleep_ms(self.latency_ms)
+        text = input_data[0] if isinstance(input_data, list) else input_data
+        return fake_embedding(str(text))
+
+    async def create_batch(self, input_data_list):
+        await _sleep_ms(self.latency_ms)
+        return [fake_embedding(text) for text in input_data_list]
+
+
+class StubGraphiti:
+    """Stand-in for ``graphiti_core.Graphiti`` with configurable latency and no Neo4j/OpenAI.
+
+    Implements the subset the API and ingestion scripts call: ``_search``,
+    ``add_episode``, ``remove_episode``, ``build_indices_and_constraints`` and ``close``.
+    """
+
+    def __init__(self, uri=None, user=None, password=None, search_ms: float = STUB_SEARCH_MS,
+                 add_episode_ms: float = STUB_ADD_EPISODE_MS, **kwargs):
+        self.search_ms = search_ms
+        self.add_episode_ms = add_episode_ms
+        self.embedder = kwargs.get("embedder") or StubEmbedder()
+        self.llm_client = kwargs.get("llm_client")
+        self.driver = None
+        self.clients = SimpleNamespace(embedder=self.embedder, llm_client=self.llm_client, driver=None)
+        self.search_calls = 0
+        self.episodes_added = 0
+
+    async def build_indices_and_constraints(self, delete_existing: bool = False):
+        pass
+
+    async def _search(self, query, config, group_ids=None, *args, **kwargs):
+        self.search_calls += 1
+        # Real searches embed the query first, then run the Neo4j hybrid query
+        await self.clients.embedder.create(input_data=[query])
+        await _sleep_ms(self.search_ms)
+        limit = getattr(config, "limit", 5)
+        nodes = [
+            SimpleNamespace(
+                uuid=str(uuid4()),
+                name=f"Procedure {i + 1} for {query[:40]}",
+                group_id=(group_ids or ["procedures"])[0],
+                summary="Stub summary. " * 20,
+                labels=["Entity", "Procedure"],
+                attributes={},
+            )
+            for i in range(limit)
+        ]
+        return _SearchResults(nodes)
+
+    async def add_episode(self, **kwargs):
+        await _sleep_ms(self.add_episode_ms)
+        self.episodes_added += 1
+        return SimpleNamespace(episode=SimpleNamespace(uuid=str(uuid4())), nodes=[], edges=[])
+
+    async def remove_episode(self, episode_uuid: str):
+        await _sleep_ms(self.search_ms)
+
+    async def close(self):
+        pass
+
+
+class _SearchResults:
+    """Iterates like graphiti's SearchResults pydantic model: ``(field, value)`` pairs."""
+
+    def __init__(self, nodes):
+        self.edges = []
+        self.nodes = nodes
+        self.episodes = []
+        self.communities = []
+
+    def __iter__(self):
+        return iter([("edges", self.edges), ("nodes", self.nodes), ("episodes", self.episodes),
+                     ("communities", self.communities)])
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import re
+
+import numpy as np
+from dotenv import load_dotenv
+from graphiti_core.embedder import OpenAIEmbedder
+
+from combine_concerns_to_md import DOCS_DIR, extract_field
+from concerns_index import CONCERNS_INDEX_DIR, save_index
+from md_builder import list_json_files, load_json
+
+load_dotenv()
+
+EMBED_BATCH_SIZE = int(os.environ.get('EMBED_BATCH_SIZE', '100'))
+MAX_CHUNK_CHARS = int(os.environ.get('CONCERNS_MAX_CHUNK_CHARS', '1500'))
+# Build an approximate (IVF) index once the corpus has at least this many chunks; 0 = never
+CONCERNS_IVF_MIN_CHUNKS = int(os.environ.get('CONCERNS_IVF_MIN_CHUNKS', '5000'))
+
+SECTIONS = [
+    ("Concern Information", "concern_information"),
+    ("Treatments Offered", "treatments_offered"),
+    ("FAQ", "concern_faq"),
+    ("Miscellaneous Information", "miscellaneous_information"),
+]
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def split_long(paragraph, max_chars):
+    """Sentences of an over-long paragraph packed into pieces of at most max_chars; over-long sentences are cut."""
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_text(text, max_chars=MAX_CHUNK_CHARS):
+    """Split on paragraph boundaries into pieces of at most max_chars; long paragraphs split on sentences."""
+    pieces, current = [], ""
+    for paragraph in text.split("\n"):
+        for part in split_long(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph]:
+            if current and len(current) + len(part) + 1 > max_chars:
+                pieces.append(current)
+                current = ""
+            current = f"{current}\n{part}" if current else part
+    if current:
+        pieces.append(current)
+    return pieces
+
+def concern_chunks(fname, doc):
+    """One chunk per concern subsection (split further if long), each prefixed with the concern name."""
+    concern = doc.get("json")
+    if not concern or not isinstance(concern, dict):
+        return []
+    name = extract_field(concern, "concern_name")
+    chunks = []
+    for heading, field in SECTIONS:
+        value = concern.get(field)
+        if not value:
+            continue
+        if not isinstance(value, str):
+            value = str(value)
+        for part, text in enumerate(split_text(value)):
+            chunks.append({
+                "id": f"{fname}#{field}:{part}",
+                "source_file": fname,
+                "concern_name": name,
+                "section": heading,
+                "text": f"{name} - {heading}\n{text}",
+            })
+    return chunks
+
+async def embed_all(embedder, texts):
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        vectors.extend(await embedder.create_batch(texts[start:start + EMBED_BATCH_SIZE]))
+        print(f"Embedded {min(start + EMBED_BATCH_SIZE, len(texts))}/{len(texts)} chunks")
+    return np.asarray(vectors, dtype=np.float32)
+
+async def main(embedder=None):
+    embedder = embedder or OpenAIEmbedder()
+    chunks = []
+    for fname in list_json_files(DOCS_DIR):
+        chunks.extend(concern_chunks(fname, load_json(os.path.join(DOCS_DIR, fname))))
+    if not chunks:
+        print(f"No concern chunks found in {DOCS_DIR}")
+        return
+    embeddings = await embed_all(embedder, [c["text"] for c in chunks])
+    ivf_lists = None
+    if CONCERNS_IVF_MIN_CHUNKS and len(chunks) >= CONCERNS_IVF_MIN_CHUNKS:
+        ivf_lists = int(np.sqrt(len(chunks)))
+    save_index(CONCERNS_INDEX_DIR, embeddings, chunks, ivf_lists=ivf_lists)
+    print(f"Wrote {len(chunks)} concern chunks to {CONCERNS_INDEX_DIR}/" + (f" with {ivf_lists} IVF lists" if ivf_lists else ""))
+
+if __name__ == "__main__":
+    asyncio.run(main())
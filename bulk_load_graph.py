@@ -0,0 +1,343 @@
+"""Deterministic bulk load of docs_kb procedure records into the Graphiti graph.
+
+The records are already structured by the scraper's ExtractSchema, so instead of
+running LLM entity/edge extraction per file through ``graphiti.add_episode``, each
+record is mapped straight onto the Procedure / BodyArea / PaymentMethod / Doctor
+entity types and their TREATS_AREA / ACCEPTS_PAYMENT / REQUIRES_REFERRAL edges.
+Embeddings are computed in batches and everything is written with Graphiti's
+UNWIND bulk queries, one transaction per batch of records. The only API calls
+left are the embedding batches.
+
+Node, edge and episode UUIDs are derived from their content, so re-running is
+idempotent and shared nodes (a payment method, a body area) are written once.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+
+from graphiti_core import Graphiti
+from graphiti_core.edges import EntityEdge, EpisodicEdge
+from graphiti_core.nodes import EntityNode, EpisodeType, EpisodicNode
+from graphiti_core.utils.bulk_utils import add_nodes_and_edges_bulk
+
+from answer_snippets import write_snippets
+from dedup_records import without_duplicates
+from embedding_cache import install_embedding_cache
+from ingest_to_graphiti import (
+    compress_procedure,
+    edge_type_map,
+    entity_types,
+    get_json_files,
+    neo4j_password,
+    neo4j_uri,
+    neo4j_user,
+)
+from ingestion_manifest import (
+    INGEST_PRUNE_REMOVED,
+    IngestionManifest,
+    content_hash,
+    prune_removed,
+    remove_episodes,
+)
+from graph_snapshot import refresh_snapshot
+from search_cache import invalidate_remote_cache
+
+logger = logging.getLogger(__name__)
+
+GROUP_ID = "procedures"
+# Records written per Neo4j transaction
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', '50'))
+BULK_EMBED_BATCH_SIZE = int(os.environ.get('BULK_EMBED_BATCH_SIZE', '100'))
+
+_UUID_NAMESPACE = uuid.UUID("5b0c1f2e-9a4d-4a51-8f0e-6d3c2b7a9e10")
+
+# Canonical body area -> pattern matched against the record text as whole words only
+BODY_AREAS = {
+    "Face": r"face",
+    "Forehead": r"forehead|frown lines?",
+    "Eyes": r"eyes?|crow'?s feet|under[- ]eye",
+    "Eyelids": r"eyelids?|blepharoplasty",
+    "Brows": r"brows?|eyebrows?",
+    "Nose": r"nose|nasal|rhinoplasty",
+    "Lips": r"lips?",
+    "Cheeks": r"cheeks?",
+    "Chin": r"chin",
+    "Jawline": r"jaw(?:line)?",
+    "Neck": r"neck",
+    "Chest": r"chest|pecs?",
+    "Breasts": r"breasts?",
+    "Abdomen": r"abdomen|abdominal|tummy|belly|stomach",
+    "Waist": r"waist|flanks?|love handles",
+    "Back": r"(?:upper|lower) back",
+    "Arms": r"arms?|upper arms?",
+    "Hands": r"hands?",
+    "Thighs": r"thighs?",
+    "Buttocks": r"buttocks?|glutes?",
+    "Legs": r"legs?|calves|knees?",
+    "Scalp": r"scalp|hairline",
+    "Labia": r"labia|labial|labiaplasty|vulva|vaginal?",
+}
+_BODY_AREA_PATTERNS = {area: re.compile(rf"\b(?:{pattern})\b", re.IGNORECASE) for area, pattern in BODY_AREAS.items()}
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_REFERRAL = re.compile(r"\breferral\b", re.IGNORECASE)
+# "No referral required", "you don't need a referral", "a referral is not necessary"
+_NO_REFERRAL = re.compile(
+    r"\b(?:no|not|without|never|don['’]?t|doesn['’]?t|isn['’]?t)\b[^.!?]{0,40}\breferral\b"
+    r"|\breferral\b[^.!?]{0,40}\b(?:not|isn['’]?t)\b[^.!?]{0,20}\b(?:required|needed|necessary)\b",
+    re.IGNORECASE,
+)
+_REFERRING_DOCTOR = re.compile(
+    r"\b(GP|general practitioner|specialist|plastic surgeon|cosmetic surgeon|dermatologist)\b", re.IGNORECASE
+)
+_DOCTOR_NAMES = {"general practitioner": "GP", "gp": "GP"}
+
+
+def stable_uuid(*parts: str) -> str:
+    return str(uuid.uuid5(_UUID_NAMESPACE, "\0".join(parts)))
+
+
+def record_text(record: dict) -> str:
+    return "\n".join(
+        str(record.get(field) or "")
+        for field in ("procedure_name", "explanation", "treatment_overview", "miscellaneous_information")
+    )
+
+
+def body_areas(record: dict) -> list[str]:
+    text = record_text(record)
+    return [area for area, pattern in _BODY_AREA_PATTERNS.items() if pattern.search(text)]
+
+
+def referring_doctors(record: dict) -> list[str]:
+    """Doctors a referral is required from, read only from sentences that require one.
+
+    Sentences saying no referral is needed are ignored, as are doctors named
+    elsewhere ("performed by a plastic surgeon"). A required referral that names
+    no doctor is taken to be from a GP.
+    """
+    sentences = [
+        s for s in _SENTENCE_END.split(record_text(record))
+        if _REFERRAL.search(s) and not _NO_REFERRAL.search(s)
+    ]
+    if not sentences:
+        return []
+    found = {_DOCTOR_NAMES.get(m.lower(), m.title()) for s in sentences for m in _REFERRING_DOCTOR.findall(s)}
+    return sorted(found) or ["GP"]
+
+
+def procedure_summary(record: dict, max_chars: int = 600) -> str:
+    """Explanation trimmed at a sentence boundary, followed by cost, recovery and results duration."""
+    explanation = (record.get("explanation") or record.get("treatment_overview") or "").strip()
+    if len(explanation) > max_chars:
+        cut = explanation[:max_chars]
+        explanation = cut[:cut.rfind(". ") + 1] or cut
+    facts = [
+        f"{label}: {record[field]}." for label, field in
+        (("Type", "procedure_type"), ("Cost", "cost"), ("Recovery", "recovery_time"), ("Results last", "results_duration"))
+        if record.get(field)
+    ]
+    return " ".join([explanation, *facts]).strip()
+
+
+class RecordGraph:
+    """Episode, entity nodes and edges built from one docs_kb record."""
+
+    def __init__(self, episode, nodes, edges, episodic_edges):
+        self.episode = episode
+        self.nodes = nodes
+        self.edges = edges
+        self.episodic_edges = episodic_edges
+
+
+def _entity(name: str, label: str, summary: str, attributes: dict, now: datetime) -> EntityNode:
+    return EntityNode(
+        uuid=stable_uuid(GROUP_ID, label, name.lower()),
+        name=name,
+        group_id=GROUP_ID,
+        labels=["Entity", label],
+        summary=summary,
+        attributes=entity_types[label](**attributes).model_dump(exclude_none=True),
+        created_at=now,
+    )
+
+
+def record_graph(fname: str, content: dict, digest: str, now: datetime) -> RecordGraph:
+    """Map one procedure record onto typed nodes and edges (no LLM involved)."""
+    record = compress_procedure(content.copy())
+    name = (record.get("procedure_name") or os.path.splitext(fname)[0]).strip()
+    procedure = _entity(name, "Procedure", procedure_summary(record), {
+        "procedure_type": record.get("procedure_type"),
+        "cost_raw": record.get("cost"),
+        "recovery_time": record.get("recovery_time"),
+        "results_duration": record.get("results_duration"),
+    }, now)
+
+    targets = []
+    for area in body_areas(record):
+        node = _entity(area, "BodyArea", f"{area}: a body area treated at the clinic.",
+                       {"anatomical_region": area}, now)
+        targets.append((node, "BodyArea", f"{name} treats the {area.lower()}."))
+    for provider in record["payments"]:
+        node = _entity(provider, "PaymentMethod", f"{provider}: a payment method accepted by the clinic.",
+                       {"provider": provider}, now)
+        targets.append((node, "PaymentMethod", f"{name} can be paid for with {provider}."))
+    for doctor in referring_doctors(record):
+        node = _entity(doctor, "Doctor", f"{doctor}: a doctor who can refer patients for procedures.",
+                       {"speciality": doctor}, now)
+        targets.append((node, "Doctor", f"{name} requires a referral from a {doctor}."))
+
+    episode_uuid = stable_uuid(GROUP_ID, "episode", fname, digest)
+    edges = []
+    for node, label, fact in targets:
+        relation = edge_type_map[("Procedure", label)][0]
+        edges.append(EntityEdge(
+            uuid=stable_uuid(GROUP_ID, relation, procedure.uuid, node.uuid),
+            group_id=GROUP_ID,
+            source_node_uuid=procedure.uuid,
+            target_node_uuid=node.uuid,
+            name=relation,
+            fact=fact,
+            episodes=[episode_uuid],
+            created_at=now,
+            valid_at=now,
+        ))
+    nodes = [procedure] + [node for node, _, _ in targets]
+    episode = EpisodicNode(
+        uuid=episode_uuid,
+        name=name,
+        group_id=GROUP_ID,
+        labels=[],
+        source=EpisodeType.json,
+        source_description="procedure metadata (bulk load)",
+        content=json.dumps(record, ensure_ascii=False),
+        created_at=now,
+        valid_at=now,
+        entity_edges=[edge.uuid for edge in edges],
+    )
+    episodic_edges = [
+        EpisodicEdge(
+            uuid=stable_uuid(GROUP_ID, "mentions", episode_uuid, node.uuid),
+            group_id=GROUP_ID,
+            source_node_uuid=episode_uuid,
+            target_node_uuid=node.uuid,
+            created_at=now,
+        )
+        for node in nodes
+    ]
+    return RecordGraph(episode, nodes, edges, episodic_edges)
+
+
+async def embed_in_batches(embedder, texts: list[str], batch_size: int = BULK_EMBED_BATCH_SIZE) -> list[list[float]]:
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(await embedder.create_batch(texts[start:start + batch_size]))
+    return vectors
+
+
+async def embed_graph(embedder, nodes: list[EntityNode], edges: list[EntityEdge]):
+    """Fill node name and edge fact embeddings with batched calls (same text Graphiti would embed)."""
+    pending_nodes = [n for n in nodes if n.name_embedding is None]
+    pending_edges = [e for e in edges if e.fact_embedding is None]
+    texts = [n.name.replace("\n", " ") for n in pending_nodes] + [e.fact.replace("\n", " ") for e in pending_edges]
+    vectors = await embed_in_batches(embedder, texts)
+    for node, vector in zip(pending_nodes, vectors):
+        node.name_embedding = vector
+    for edge, vector in zip(pending_edges, vectors[len(pending_nodes):]):
+        edge.fact_embedding = vector
+
+
+async def write_batch(graphiti, graphs: list[RecordGraph]):
+    """Embed and write a batch of record graphs in one transaction; shared nodes are sent once."""
+    nodes = list({node.uuid: node for g in graphs for node in g.nodes}.values())
+    edges = [edge for g in graphs for edge in g.edges]
+    await embed_graph(graphiti.embedder, nodes, edges)
+    await add_nodes_and_edges_bulk(
+        graphiti.driver,
+        [g.episode for g in graphs],
+        [e for g in graphs for e in g.episodic_edges],
+        nodes,
+        edges,
+        graphiti.embedder,
+    )
+
+
+async def bulk_load(graphiti, docs_dir: str, files: list[str], manifest: IngestionManifest,
+                    batch_size: int = BULK_BATCH_SIZE) -> tuple[int, int, int]:
+    """Load every new or changed record; returns ``(loaded, skipped, unchanged)``."""
+    now = datetime.now(timezone.utc)
+    loaded = skipped = unchanged = 0
+    pending: list[tuple[str, str, RecordGraph]] = []
+
+    async def flush():
+        nonlocal loaded
+        if not pending:
+            return
+        await write_batch(graphiti, [graph for _, _, graph in pending])
+        # Old episodes go only once their replacements are written, so a failed batch leaves the old graph intact.
+        # Shared nodes and edges now belong to the new episode too, so only what the record lost is deleted.
+        for fname, digest, graph in pending:
+            await remove_episodes(graphiti, manifest.previous_episodes(fname))
+            manifest.record(fname, digest, [graph.episode.uuid], save=False)
+        manifest.save()
+        loaded += len(pending)
+        logger.info(f"[BATCH] Wrote {len(pending)} records ({loaded} so far)")
+        pending.clear()
+
+    for fname in files:
+        with open(os.path.join(docs_dir, fname), 'r') as f:
+            content = json.load(f).get('json')
+        if not content:
+            logger.warning(f"[SKIP] No 'json' field in {fname}")
+            skipped += 1
+            continue
+        # Hash the mode too, so switching from episode ingestion replaces the LLM-extracted episodes
+        digest = content_hash({"mode": "bulk", "record": content})
+        if manifest.is_current(fname, digest):
+            unchanged += 1
+            continue
+        pending.append((fname, digest, record_graph(fname, content, digest, now)))
+        if len(pending) >= batch_size:
+            await flush()
+    await flush()
+    return loaded, skipped, unchanged
+
+
+async def main():
+    if not neo4j_uri or not neo4j_user or not neo4j_password:
+        logger.error('NEO4J_URI, NEO4J_USER, and NEO4J_PASSWORD must be set')
+        raise ValueError('NEO4J_URI, NEO4J_USER, and NEO4J_PASSWORD must be set')
+
+    logger.info("Opening connection to Graphiti...")
+    graphiti = Graphiti(neo4j_uri, neo4j_user, neo4j_password)
+    embedding_cache = install_embedding_cache(graphiti)
+    try:
+        await graphiti.build_indices_and_constraints()
+        docs_dir = "docs_kb"
+        files = without_duplicates(get_json_files(docs_dir), docs_dir=docs_dir)
+        logger.info(f"Found {len(files)} files to bulk load from '{docs_dir}'.")
+
+        manifest = IngestionManifest()
+        if INGEST_PRUNE_REMOVED:
+            pruned = await prune_removed(graphiti, manifest, files)
+            logger.info(f"Pruned episodes of {pruned} removed records.")
+
+        loaded, skipped, unchanged = await bulk_load(graphiti, docs_dir, files, manifest)
+        logger.info(f"Bulk load complete. Loaded: {loaded}, Skipped: {skipped}, Unchanged: {unchanged}")
+        if loaded:
+            write_snippets(docs_dir)
+            await refresh_snapshot(graphiti.driver, GROUP_ID)
+            invalidate_remote_cache(GROUP_ID)
+    finally:
+        if embedding_cache:
+            await embedding_cache.close()
+            logger.info(f"Embedding cache: {embedding_cache.stats()}")
+        await graphiti.close()
+        logger.info('Graphiti connection closed')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,152 @@
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+CONCERNS_INDEX_DIR = os.environ.get('CONCERNS_INDEX_DIR', 'concerns_index')
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.jsonl"
+IVF_FILE = "ivf.npz"
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def build_ivf(embeddings: np.ndarray, n_lists: int | None = None, iterations: int = 20, seed: int = 0):
+    """Spherical k-means coarse quantizer for approximate search.
+
+    Returns ``(centroids, offsets, ids)``: the chunk ids of list ``i`` are
+    ``ids[offsets[i]:offsets[i + 1]]``.
+    """
+    n = len(embeddings)
+    n_lists = n_lists or max(1, int(np.sqrt(n)))
+    rng = np.random.default_rng(seed)
+    centroids = embeddings[rng.choice(n, size=n_lists, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignments = np.argmax(embeddings @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = embeddings[assignments == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+        centroids = normalize_rows(centroids)
+    assignments = np.argmax(embeddings @ centroids.T, axis=1)
+    ids = np.argsort(assignments, kind="stable").astype(np.int32)
+    offsets = np.searchsorted(assignments[ids], np.arange(n_lists + 1)).astype(np.int64)
+    return centroids, offsets, ids
+
+
+def _swap_in(index_dir: str, version_dir: str):
+    """Point ``index_dir`` (a symlink) at ``version_dir`` with one rename; older versions but the previous are removed."""
+    link_tmp = f"{index_dir}.link.tmp"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(os.path.basename(version_dir), link_tmp)
+    previous = os.path.realpath(index_dir) if os.path.islink(index_dir) else None
+    if os.path.isdir(index_dir) and not os.path.islink(index_dir):
+        # Layout from before versioned directories: a plain directory can't be replaced by a rename
+        legacy = f"{index_dir}.legacy"
+        shutil.rmtree(legacy, ignore_errors=True)
+        os.rename(index_dir, legacy)
+        previous = os.path.realpath(legacy)
+    os.replace(link_tmp, index_dir)
+    parent = os.path.dirname(os.path.abspath(index_dir))
+    prefix = f"{os.path.basename(index_dir)}."
+    for name in os.listdir(parent):
+        path = os.path.join(parent, name)
+        # The previous version stays, so a reader that resolved the link just before the swap can still open it
+        if (name.startswith(prefix) and os.path.isdir(path) and not os.path.islink(path)
+                and path not in (os.path.realpath(version_dir), previous)):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def save_index(index_dir: str, embeddings: np.ndarray, metadata: list[dict], ivf_lists: int | None = None):
+    """Write normalised float32 embeddings, the metadata sidecar and (optionally) an IVF index.
+
+    All files go to a new ``<index_dir>.<time_ns>`` directory, and the
+    ``index_dir`` symlink is then swapped to it with a single rename. A crash
+    never leaves the matrix and metadata out of step, and a running API never
+    sees a half-written index.
+    """
+    embeddings = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    index_dir = index_dir.rstrip("/")
+    version_dir = f"{index_dir}.{time.time_ns()}"
+    os.makedirs(version_dir)
+    try:
+        with open(os.path.join(version_dir, EMBEDDINGS_FILE), "wb") as f:
+            np.save(f, embeddings)
+        with open(os.path.join(version_dir, METADATA_FILE), "wb") as f:
+            for row in metadata:
+                f.write(orjson.dumps(row) + b"\n")
+        if ivf_lists:
+            centroids, offsets, ids = build_ivf(embeddings, ivf_lists)
+            with open(os.path.join(version_dir, IVF_FILE), "wb") as f:
+                np.savez(f, centroids=centroids, offsets=offsets, ids=ids)
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    _swap_in(index_dir, version_dir)
+
+
+class ConcernsIndex:
+    """Memory-mapped concern chunk embeddings with exact or IVF top-k search.
+
+    The embedding matrix is opened with ``mmap_mode='r'`` so every uvicorn
+    worker shares the page cache instead of holding its own copy.
+    """
+
+    def __init__(self, index_dir: str = CONCERNS_INDEX_DIR):
+        self.index_dir = index_dir
+        if not os.path.exists(index_dir):
+            raise FileNotFoundError(index_dir)
+        # Resolve the symlink once, so every file comes from the same version even if a rebuild swaps it meanwhile
+        index_dir = os.path.realpath(index_dir)
+        self.embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, METADATA_FILE), "rb") as f:
+            self.metadata = [orjson.loads(line) for line in f if line.strip()]
+        if len(self.metadata) != len(self.embeddings):
+            raise ValueError(
+                f"{index_dir}: {len(self.embeddings)} embeddings but {len(self.metadata)} metadata rows"
+            )
+        self.centroids = self.offsets = self.ids = None
+        ivf_path = os.path.join(index_dir, IVF_FILE)
+        if os.path.exists(ivf_path):
+            ivf = np.load(ivf_path)
+            self.centroids, self.offsets, self.ids = ivf["centroids"], ivf["offsets"], ivf["ids"]
+
+    def __len__(self):
+        return len(self.metadata)
+
+    def search(self, query_embedding, k: int = 5, nprobe: int | None = None) -> list[dict]:
+        """Top ``k`` chunks by cosine similarity.
+
+        With an IVF index and ``nprobe`` set, only the ``nprobe`` closest lists
+        are scanned; otherwise every chunk is scored.
+        """
+        if not len(self.metadata):
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        if nprobe and self.centroids is not None:
+            lists = np.argsort(-(self.centroids @ query))[:nprobe]
+            candidates = np.sort(np.concatenate([self.ids[self.offsets[c]:self.offsets[c + 1]] for c in lists]))
+            scores = self.embeddings[candidates] @ query
+        else:
+            candidates = None
+            scores = self.embeddings @ query
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            chunk_id = int(candidates[i]) if candidates is not None else int(i)
+            results.append({**self.metadata[chunk_id], "score": float(scores[i])})
+        return results
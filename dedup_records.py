@@ -0,0 +1,275 @@
+"""Find duplicate and near-duplicate docs_kb records before ingestion.
+
+    python dedup_records.py [docs_dir]
+
+Scraping with ``map_url`` keeps every URL variant (trailing slashes, query
+strings, listing pages repeating a procedure), so the same procedure can land
+in several files. Records are grouped in three passes:
+
+1. by canonical URL from the ``metadata`` block,
+2. by exact hash of the extracted ``json`` fields,
+3. by MinHash/LSH over word shingles of those fields, confirmed by exact
+   Jaccard similarity of the shingle sets.
+
+One record per group is kept: the most complete, then the one with the
+shortest URL. ``DEDUP_MANIFEST`` lists kept and duplicate files, with the
+content hash of each, for the ingestion scripts; ``DEDUP_REPORT`` explains
+every group.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit
+
+import numpy as np
+
+from generate_procedures_md import DOCS_DIR
+from ingestion_manifest import content_hash
+from md_builder import list_json_files, load_json
+
+logger = logging.getLogger(__name__)
+
+DEDUP_MANIFEST = os.environ.get('DEDUP_MANIFEST', 'dedup_manifest.json')
+DEDUP_REPORT = os.environ.get('DEDUP_REPORT', 'dedup_report.json')
+# Jaccard similarity of word shingles at which two records count as the same procedure
+DEDUP_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', '0.85'))
+DEDUP_SHINGLE_WORDS = int(os.environ.get('DEDUP_SHINGLE_WORDS', '5'))
+# 16 bands x 8 rows: pairs above ~0.7 Jaccard almost always share a band
+DEDUP_BANDS = int(os.environ.get('DEDUP_BANDS', '16'))
+DEDUP_ROWS = int(os.environ.get('DEDUP_ROWS', '8'))
+
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+")
+
+
+def canonical_url(url: str | None) -> str | None:
+    """Lowercased scheme and host, no ``www.``, query, fragment or trailing slash."""
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower() or "https", host, path, "", ""))
+
+
+def record_url(metadata: dict) -> str | None:
+    return metadata.get("og:url") or metadata.get("ogUrl") or metadata.get("url") or metadata.get("sourceURL")
+
+
+def record_text(record: dict) -> str:
+    return " ".join(str(record[key]) for key in sorted(record) if record[key])
+
+
+def shingles(text: str, words: int = DEDUP_SHINGLE_WORDS) -> set[int]:
+    """CRC32 hashes of the overlapping ``words``-word windows of the lowercased text."""
+    tokens = _WORD.findall(text.lower())
+    if len(tokens) < words:
+        return {zlib.crc32(" ".join(tokens).encode("utf-8"))} if tokens else set()
+    return {zlib.crc32(" ".join(tokens[i:i + words]).encode("utf-8")) for i in range(len(tokens) - words + 1)}
+
+
+class MinHasher:
+    """MinHash signatures from universal hashes ``(a * x + b) mod p``, vectorised over all permutations."""
+
+    def __init__(self, num_perm: int, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: set[int]) -> np.ndarray:
+        if not hashes:
+            return np.full(len(self.a), _PRIME, dtype=np.uint64)
+        x = np.fromiter(hashes, dtype=np.uint64, count=len(hashes)) % _PRIME
+        return ((np.outer(x, self.a) + self.b) % _PRIME).min(axis=0)
+
+
+def lsh_candidates(signatures: list[np.ndarray], bands: int = DEDUP_BANDS, rows: int = DEDUP_ROWS) -> set[tuple[int, int]]:
+    """Index pairs whose signatures agree on every row of at least one band."""
+    pairs = set()
+    for band in range(bands):
+        buckets: dict[bytes, list[int]] = {}
+        for i, signature in enumerate(signatures):
+            buckets.setdefault(signature[band * rows:(band + 1) * rows].tobytes(), []).append(i)
+        for members in buckets.values():
+            pairs.update((a, b) for n, a in enumerate(members) for b in members[n + 1:])
+    return pairs
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class DisjointSet:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int) -> bool:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        self.parent[max(root_a, root_b)] = min(root_a, root_b)
+        return True
+
+
+def completeness(record: dict) -> tuple:
+    """Sort key for the record to keep: most filled fields, shortest URL (listing pages nest deeper), most
+    text, then file name."""
+    fields = sum(1 for value in record["json"].values() if value)
+    return (-fields, len(record["url"] or ""), -len(record["text"]), record["fname"])
+
+
+def find_duplicates(records: list[dict], threshold: float = DEDUP_THRESHOLD) -> tuple[list[str], dict[str, dict], list[dict]]:
+    """``(kept files, {duplicate file: {duplicate_of, reason, similarity}}, groups)``.
+
+    ``records`` are dicts with ``fname``, ``json`` and ``metadata``.
+    """
+    for record in records:
+        record["url"] = canonical_url(record_url(record["metadata"]))
+        record["text"] = record_text(record["json"])
+        record["hash"] = content_hash(record["json"])
+    groups = DisjointSet(len(records))
+    for field in ("url", "hash"):
+        first_seen: dict[str, int] = {}
+        for i, record in enumerate(records):
+            if record[field] is None:
+                continue
+            groups.union(first_seen.setdefault(record[field], i), i)
+
+    shingle_sets = [shingles(record["text"]) for record in records]
+    hasher = MinHasher(DEDUP_BANDS * DEDUP_ROWS)
+    signatures = [hasher.signature(s) for s in shingle_sets]
+    for a, b in sorted(lsh_candidates(signatures)):
+        if groups.find(a) == groups.find(b):
+            continue
+        if jaccard(shingle_sets[a], shingle_sets[b]) >= threshold:
+            groups.union(a, b)
+
+    members: dict[int, list[int]] = {}
+    for i in range(len(records)):
+        members.setdefault(groups.find(i), []).append(i)
+    kept, duplicates, report = [], {}, []
+    for indexes in members.values():
+        keep = min(indexes, key=lambda i: completeness(records[i]))
+        kept.append(records[keep]["fname"])
+        if len(indexes) == 1:
+            continue
+        group = {"kept": records[keep]["fname"], "url": records[keep]["url"], "duplicates": []}
+        for i in sorted(indexes, key=lambda i: records[i]["fname"]):
+            if i == keep:
+                continue
+            # Described relative to the kept record, even when the group was joined through another member
+            similarity = round(jaccard(shingle_sets[keep], shingle_sets[i]), 4)
+            if records[i]["url"] is not None and records[i]["url"] == records[keep]["url"]:
+                reason = "url"
+            elif records[i]["hash"] == records[keep]["hash"]:
+                reason = "exact"
+            else:
+                reason = "near"
+            duplicates[records[i]["fname"]] = {
+                "duplicate_of": records[keep]["fname"], "reason": reason, "similarity": similarity,
+            }
+            group["duplicates"].append({"file": records[i]["fname"], "url": records[i]["url"],
+                                        "reason": reason, "similarity": similarity})
+        report.append(group)
+    return sorted(kept), duplicates, sorted(report, key=lambda g: g["kept"])
+
+
+def _write_json(path: str, data: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def dedup_directory(docs_dir: str = DOCS_DIR, manifest_path: str = DEDUP_MANIFEST,
+                    report_path: str = DEDUP_REPORT, threshold: float = DEDUP_THRESHOLD) -> dict:
+    """Scan ``docs_dir``, write the dedup manifest and report, and return the report's summary."""
+    records, empty = [], []
+    for fname in list_json_files(docs_dir):
+        doc = load_json(os.path.join(docs_dir, fname))
+        if not doc.get("json") or not isinstance(doc["json"], dict):
+            empty.append(fname)
+            continue
+        records.append({"fname": fname, "json": doc["json"], "metadata": doc.get("metadata") or {}})
+    kept, duplicates, groups = find_duplicates(records, threshold)
+    reasons = [entry["reason"] for entry in duplicates.values()]
+    summary = {
+        "records": len(records),
+        "kept": len(kept),
+        "duplicates": len(duplicates),
+        "by_reason": {reason: reasons.count(reason) for reason in ("url", "exact", "near")},
+        "empty": len(empty),
+    }
+    generated_at = datetime.now(timezone.utc).isoformat()
+    # Hashes let without_duplicates tell whether a pair still holds once the files change
+    hashes = {record["fname"]: record["hash"] for record in records}
+    _write_json(manifest_path, {"docs_dir": docs_dir, "generated_at": generated_at, "threshold": threshold,
+                                "kept": kept, "duplicates": duplicates, "hashes": hashes})
+    _write_json(report_path, {"generated_at": generated_at, "summary": summary, "empty": empty, "groups": groups})
+    logger.info(f"Dedup of {docs_dir}: {summary}")
+    return summary
+
+
+def _current_hash(docs_dir: str, fname: str) -> str | None:
+    try:
+        record = load_json(os.path.join(docs_dir, fname)).get("json")
+    except (OSError, ValueError):
+        return None
+    return content_hash(record) if record else None
+
+
+def without_duplicates(files: list[str], manifest_path: str = DEDUP_MANIFEST, docs_dir: str | None = None) -> list[str]:
+    """``files`` minus those the dedup manifest marks as duplicates; unchanged when there is no manifest.
+
+    A file is skipped only while the file it duplicates is still in ``files``
+    and both still have the content hashes recorded by the dedup run; otherwise
+    it is kept. Files scraped after the dedup run aren't in the manifest and are
+    kept too. ``docs_dir`` defaults to the one the manifest was built from.
+    """
+    if not os.path.exists(manifest_path):
+        return files
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    duplicates = manifest.get("duplicates", {})
+    hashes = manifest.get("hashes", {})
+    docs_dir = docs_dir or manifest.get("docs_dir") or DOCS_DIR
+    present = set(files)
+    skip, stale = set(), []
+    for fname in files:
+        entry = duplicates.get(fname)
+        if entry is None:
+            continue
+        original = entry["duplicate_of"]
+        if (original in present and hashes.get(fname) is not None
+                and _current_hash(docs_dir, fname) == hashes[fname]
+                and _current_hash(docs_dir, original) == hashes.get(original)):
+            skip.add(fname)
+        else:
+            stale.append(fname)
+    if stale:
+        logger.warning(
+            f"Ingesting {len(stale)} records listed as duplicates in {manifest_path} because they or the records "
+            f"they duplicate changed or disappeared; re-run dedup_records.py"
+        )
+    kept = [f for f in files if f not in skip]
+    if skip:
+        logger.info(f"Skipping {len(skip)} duplicate records listed in {manifest_path}")
+    return kept
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    docs_dir = sys.argv[1] if len(sys.argv) > 1 else DOCS_DIR
+    summary = dedup_directory(docs_dir)
+    print(f"{summary['records']} records: kept {summary['kept']}, {summary['duplicates']} duplicates "
+          f"{summary['by_reason']}. Report in {DEDUP_REPORT}, manifest in {DEDUP_MANIFEST}")
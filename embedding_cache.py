@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_DIR = os.environ.get('EMBEDDING_CACHE_DIR', '.embedding_cache')
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.environ.get('EMBEDDING_CACHE_MEMORY_ENTRIES', '4096'))
+# On-disk budget in bytes; diskcache evicts least recently stored entries beyond it
+EMBEDDING_CACHE_SIZE_LIMIT = int(os.environ.get('EMBEDDING_CACHE_SIZE_LIMIT', str(1024 ** 3)))
+# Set to "0" to embed every text through the API
+EMBEDDING_CACHE_ENABLED = os.environ.get('EMBEDDING_CACHE_ENABLED', '1') != '0'
+
+_WHITESPACE = re.compile(r"\s+")
+# Disk entry holding (api_seconds, api_texts), so saved-time estimates survive restarts
+_LATENCY_KEY = "api_latency"
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace only; case and punctuation change the embedding, so they stay."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def embedder_model(embedder) -> str:
+    config = getattr(embedder, "config", None)
+    model = getattr(config, "embedding_model", None) or type(embedder).__name__
+    dim = getattr(config, "embedding_dim", None)
+    return f"{model}:{dim}" if dim else str(model)
+
+
+class CachedEmbedder:
+    """Embedder wrapper with an in-memory LRU in front of a ``diskcache`` store.
+
+    Keys are ``sha256(model, normalized text)``. The disk tier is SQLite-backed and
+    safe to share between processes, so every uvicorn worker and ingestion run on
+    the host reuses the same vectors, and they survive restarts. Vectors are stored
+    as float32 bytes. Disk reads run in a thread so they never block the event
+    loop. Misses are written to disk behind the caller's back: the vector is
+    returned from memory straight away, and ``close()`` waits for the pending
+    writes.
+    """
+
+    def __init__(self, inner, directory: str | None = EMBEDDING_CACHE_DIR,
+                 memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES,
+                 size_limit: int = EMBEDDING_CACHE_SIZE_LIMIT):
+        self.inner = inner
+        self.config = getattr(inner, "config", None)
+        self.model = embedder_model(inner)
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self.disk = None
+        if directory:
+            import diskcache
+            self.disk = diskcache.Cache(directory, size_limit=size_limit)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._writes: set[asyncio.Task] = set()
+        # len(self.disk) is a SQLite count, so stats() reports the figure from the last write instead
+        self._disk_entries = len(self.disk) if self.disk is not None else 0
+        # Running mean of API latency per text, used to estimate time saved by hits
+        self._api_seconds, self._api_texts = (0.0, 0)
+        if self.disk is not None:
+            self._api_seconds, self._api_texts = self.disk.get(_LATENCY_KEY, (0.0, 0))
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: list[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _hit(self, tier: str):
+        if tier == "memory":
+            self.memory_hits += 1
+        else:
+            self.disk_hits += 1
+        saved = self._api_seconds / self._api_texts if self._api_texts else 0.0
+        self.saved_seconds += saved
+        metrics.EMBEDDING_CACHE.labels(tier).inc()
+        metrics.EMBEDDING_CACHE_SAVED.inc(saved)
+
+    def _disk_get_many(self, keys: list[str]) -> list[bytes | None]:
+        return [self.disk.get(key) for key in keys]
+
+    def _disk_set_many(self, items: list[tuple[str, bytes]]):
+        for key, raw in items:
+            self.disk.set(key, raw)
+        self._disk_entries = len(self.disk)
+
+    def _write_done(self, task: asyncio.Task):
+        self._writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Could not write embeddings to the disk cache: {task.exception()}")
+
+    async def lookup_many(self, texts: list[str]) -> list[list[float] | None]:
+        """Cached vectors for ``texts`` (None where missing); disk reads run in a thread, off the event loop."""
+        keys = [self.key(text) for text in texts]
+        vectors = []
+        for key in keys:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self._hit("memory")
+            vectors.append(vector)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing and self.disk is not None:
+            raws = await asyncio.to_thread(self._disk_get_many, [keys[i] for i in missing])
+            for i, raw in zip(missing, raws):
+                if raw is not None:
+                    vectors[i] = np.frombuffer(raw, dtype=np.float32).tolist()
+                    self._remember(keys[i], vectors[i])
+                    self._hit("disk")
+        return vectors
+
+    def store_many(self, texts: list[str], vectors: list[list[float]]) -> list[list[float]]:
+        """Remember ``vectors`` in memory and start writing them to disk in the background."""
+        items = []
+        stored = []
+        for text, vector in zip(texts, vectors):
+            key = self.key(text)
+            vector = [float(v) for v in vector]
+            self._remember(key, vector)
+            items.append((key, np.asarray(vector, dtype=np.float32).tobytes()))
+            stored.append(vector)
+        if self.disk is not None:
+            task = asyncio.create_task(asyncio.to_thread(self._disk_set_many, items))
+            self._writes.add(task)
+            task.add_done_callback(self._write_done)
+        return stored
+
+    def _record_api(self, texts: int, elapsed: float):
+        # Kept in memory and persisted on close(), so a miss costs no extra disk write
+        self.misses += texts
+        self._api_texts += texts
+        self._api_seconds += elapsed
+        metrics.EMBEDDING_CACHE.labels("miss").inc(texts)
+
+    async def create(self, input_data):
+        # Graphiti passes a one-element list of text; token inputs are not cached
+        text = input_data[0] if isinstance(input_data, list) and len(input_data) == 1 else input_data
+        if not isinstance(text, str):
+            return await self.inner.create(input_data)
+        vector = (await self.lookup_many([text]))[0]
+        if vector is not None:
+            return vector
+        start = time.perf_counter()
+        vector = await self.inner.create(input_data)
+        self._record_api(1, time.perf_counter() - start)
+        return self.store_many([text], [vector])[0]
+
+    async def create_batch(self, input_data_list: list[str]) -> list[list[float]]:
+        vectors = await self.lookup_many(input_data_list)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            start = time.perf_counter()
+            fresh = await self.inner.create_batch([input_data_list[i] for i in missing])
+            self._record_api(len(missing), time.perf_counter() - start)
+            stored = self.store_many([input_data_list[i] for i in missing], fresh)
+            for i, vector in zip(missing, stored):
+                vectors[i] = vector
+        return vectors
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "model": self.model,
+            "memory_entries": len(self._memory),
+            "disk_entries": self._disk_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+    async def close(self):
+        """Wait for pending disk writes, then persist the latency estimate and close the store."""
+        await asyncio.gather(*self._writes, return_exceptions=True)
+        if self.disk is not None:
+            self.disk.set(_LATENCY_KEY, (self._api_seconds, self._api_texts))
+            self.disk.close()
+
+
+def install_embedding_cache(graphiti, directory: str | None = EMBEDDING_CACHE_DIR):
+    """Put a ``CachedEmbedder`` under a Graphiti instance (its search and ingestion read ``clients.embedder``).
+
+    Returns the cache, or ``None`` when ``EMBEDDING_CACHE_ENABLED`` is off.
+    """
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    cache = CachedEmbedder(graphiti.embedder, directory)
+    graphiti.embedder = cache
+    graphiti.clients.embedder = cache
+    return cache
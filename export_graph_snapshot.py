@@ -0,0 +1,31 @@
+"""Snapshot the Graphiti ``procedures`` group to GRAPH_SNAPSHOT_PATH for in-process traversal by the API.
+
+The ingestion scripts do this automatically after a run that changed the graph;
+run it by hand after editing the graph some other way.
+"""
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from neo4j import AsyncGraphDatabase
+
+from graph_snapshot import GRAPH_SNAPSHOT_PATH, export_snapshot
+
+load_dotenv()
+
+NEO4J_URI = os.environ.get('NEO4J_URI', 'bolt://localhost:7687')
+NEO4J_USER = os.environ.get('NEO4J_USER', 'neo4j')
+NEO4J_PASSWORD = os.environ.get('NEO4J_PASSWORD', 'password')
+
+
+async def main(group_id: str = "procedures"):
+    driver = AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        nodes, edges = await export_snapshot(driver, group_id)
+        print(f"Wrote {nodes} nodes and {edges} edges of '{group_id}' to {GRAPH_SNAPSHOT_PATH}")
+    finally:
+        await driver.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
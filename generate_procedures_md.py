@@ -1,9 +1,8 @@
-import os
-import json
+from md_builder import build, output_paths
 
 DOCS_DIR = "docs_kb"
 OUTPUT_FILE = "procedures.md"
-EXCLUDE_FILES = {"all_links.json", ".DS_Store"}
+CHUNKS_FILE = "procedures_chunks.jsonl"
 
 def get_og_url(metadata):
     # Try both 'og:url' and 'ogUrl'
@@ -17,9 +16,7 @@ def get_og_url(metadata):
 def extract_field(data, field):
     return data.get(field) or "Not specified"
 
-def process_file(filepath):
-    with open(filepath, "r", encoding="utf-8") as f:
-        doc = json.load(f)
+def render_procedure(doc):
     procedure = doc.get("json")
     metadata = doc.get("metadata", {})
     if not procedure or not isinstance(procedure, dict):
@@ -33,7 +30,7 @@ def process_file(filepath):
     duration = extract_field(procedure, "results_duration")
     misc = extract_field(procedure, "miscellaneous_information")
     og_url = get_og_url(metadata)
-    return f"""## {name}
+    section = f"""## {name}
 
 **Source:** [{og_url}]({og_url})
 
@@ -60,28 +57,19 @@ def process_file(filepath):
 
 ---
 """
+    return section, {"procedure_name": name, "url": og_url}
 
 def main():
-    files = [
-        f for f in os.listdir(DOCS_DIR)
-        if f.endswith(".json") and f not in EXCLUDE_FILES
-    ]
-    files.sort(key=lambda x: int(x.split(".")[0]) if x.split(".")[0].isdigit() else x)
-    output = [
+    header = [
         "<!--",
         "This file is auto-generated by extracting the `json` field from each .json file in docs_kb/.",
         "Each procedure is a top-level heading, with subheadings for each field, and includes the og:url as metadata.",
         "If a field is missing, it is marked as 'Not specified'.",
         "-->\n"
     ]
-    for fname in files:
-        fpath = os.path.join(DOCS_DIR, fname)
-        section = process_file(fpath)
-        if section:
-            output.append(section)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as out:
-        out.write("\n".join(output))
-    print(f"Wrote {len(output)-1} procedures to {OUTPUT_FILE}")
+    output_file, chunks_file = output_paths(OUTPUT_FILE, CHUNKS_FILE)
+    count = build(DOCS_DIR, render_procedure, header, output_file=output_file, chunks_file=chunks_file)
+    print(f"Wrote {count} procedures to {', '.join(p for p in (output_file, chunks_file) if p)}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,5 +1,6 @@
 
 import asyncio
+import contextlib
 import json
 import logging
 import os
@@ -12,6 +13,22 @@ from graphiti_core import Graphiti
 from graphiti_core.nodes import EpisodeType
 from pydantic import BaseModel, Field
 
+from ingestion_manifest import (
+    INGEST_PRUNE_REMOVED,
+    IngestionManifest,
+    content_hash,
+    episode_uuids,
+    prune_removed,
+    remove_episodes,
+)
+from answer_snippets import write_snippets
+from dedup_records import without_duplicates
+from embedding_cache import install_embedding_cache
+from llm_cache import install_llm_cache
+from ingest_profiler import install_profiler
+from graph_snapshot import refresh_snapshot
+from search_cache import invalidate_remote_cache
+
 # CONFIGURATION
 logging.basicConfig(
     level=INFO,
@@ -72,17 +89,26 @@ async def main():
 
     logger.info("Opening connection to Graphiti...")
     graphiti = Graphiti(neo4j_uri, neo4j_user, neo4j_password)
+    embedding_cache = install_embedding_cache(graphiti)
+    llm_cache = install_llm_cache(graphiti)
+    # Outermost, so cache hits are profiled as calls that cost no API time
+    profiler = install_profiler(graphiti)
     success_count = 0
     skip_count = 0
+    unchanged_count = 0
     fail_count = 0
     try:
         await graphiti.build_indices_and_constraints()
         docs_dir = "docs_kb"
-        files = get_json_files(docs_dir)
+        files = without_duplicates(get_json_files(docs_dir), docs_dir=docs_dir)
 
         logger.info(f"Found {len(files)} files to process in '{docs_dir}'.")
 
-        files = files[100:124]
+        manifest = IngestionManifest()
+        if INGEST_PRUNE_REMOVED:
+            pruned = await prune_removed(graphiti, manifest, files)
+            logger.info(f"Pruned episodes of {pruned} removed records.")
+
         for i, fname in enumerate(files):
             fpath = os.path.join(docs_dir, fname)
             logger.info(f"[START] Processing file {i+1}/{len(files)}: {fname}")
@@ -94,31 +120,50 @@ async def main():
                     logger.warning(f"[SKIP] No 'json' field in {fname} (index {i})")
                     skip_count += 1
                     continue
+                digest = content_hash(content)
+                if manifest.is_current(fname, digest):
+                    logger.info(f"[UNCHANGED] {fname} matches the ingestion manifest")
+                    unchanged_count += 1
+                    continue
                 episode_body = content.copy()
                 episode_name = content.get('procedure_name', f"Procedure {i+1}")
-                logger.info(f"Adding episode: name='{episode_name}' from file '{fname}'")
-                episode = await graphiti.add_episode(
-                    name="Procedure",
-                    episode_body=json.dumps(episode_body),
-                    source=EpisodeType.json,
-                    source_description='procedures metadata',
-                    reference_time=datetime.now(timezone.utc),
-                    group_id="procedures",
-                    entity_types=entity_types
-                )
-                # Log the result appropriately
-                if hasattr(episode, 'episodes') and episode.episodes:
-                    logger.info(f"[SUCCESS] Added episode from {fname}: {episode.episodes[0].uuid}")
-                else:
-                    logger.info(f"[SUCCESS] Added episode from {fname}: {episode}")
+                with profiler.episode(fname, episode_name) if profiler else contextlib.nullcontext():
+                    logger.info(f"Adding episode: name='{episode_name}' from file '{fname}'")
+                    episode = await graphiti.add_episode(
+                        name="Procedure",
+                        episode_body=json.dumps(episode_body),
+                        source=EpisodeType.json,
+                        source_description='procedures metadata',
+                        reference_time=datetime.now(timezone.utc),
+                        group_id="procedures",
+                        entity_types=entity_types
+                    )
+                    # A changed record replaces the episodes it produced last time, once the new one is in the graph
+                    await remove_episodes(graphiti, manifest.previous_episodes(fname))
+                uuids = episode_uuids(episode)
+                manifest.record(fname, digest, uuids)
+                logger.info(f"[SUCCESS] Added episode from {fname}: {uuids or episode}")
                 success_count += 1
             except Exception as e:
                 import traceback
                 logger.error(f"[ERROR] Failed to add {fname} (index {i}): {e}\n{traceback.format_exc()}")
                 fail_count += 1
             logger.info(f"[END] Finished processing file {i+1}/{len(files)}: {fname}")
-        logger.info(f"Processing complete. Success: {success_count}, Skipped: {skip_count}, Failed: {fail_count}")
+        logger.info(f"Processing complete. Success: {success_count}, Skipped: {skip_count}, Unchanged: {unchanged_count}, Failed: {fail_count}")
+        if success_count:
+            write_snippets(docs_dir)
+            await refresh_snapshot(graphiti.driver, "procedures")
+            invalidate_remote_cache("procedures")
     finally:
+        if profiler:
+            profiler.write_report()
+            profiler.close()
+        if embedding_cache:
+            await embedding_cache.close()
+            logger.info(f"Embedding cache: {embedding_cache.stats()}")
+        if llm_cache:
+            logger.info(f"LLM cache: {llm_cache.stats()}")
+            llm_cache.close()
         await graphiti.close()
         logger.info('Graphiti connection closed')
 
@@ -0,0 +1,313 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from search_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+GRAPH_SNAPSHOT_PATH = os.environ.get('GRAPH_SNAPSHOT_PATH', 'graph_snapshot.npz')
+# How often the API checks whether ingestion wrote a newer snapshot
+GRAPH_SNAPSHOT_CHECK_SECONDS = float(os.environ.get('GRAPH_SNAPSHOT_CHECK_SECONDS', '5'))
+# Set to "0" to stop the ingestion scripts re-exporting the snapshot after a run that changed the graph
+GRAPH_SNAPSHOT_EXPORT = os.environ.get('GRAPH_SNAPSHOT_EXPORT', '1') != '0'
+
+# Node properties that are not entity attributes
+_NODE_FIELDS = {"uuid", "name", "group_id", "summary", "created_at", "name_embedding", "labels"}
+
+NODES_QUERY = """
+MATCH (n:Entity)
+WHERE n.group_id = $group_id
+RETURN n.uuid AS uuid, labels(n) AS labels, properties(n) AS properties
+ORDER BY n.uuid
+"""
+EDGES_QUERY = """
+MATCH (a:Entity)-[e:RELATES_TO]->(b:Entity)
+WHERE e.group_id = $group_id AND e.expired_at IS NULL AND e.invalid_at IS NULL
+RETURN a.uuid AS source, b.uuid AS target, e.name AS name, e.fact AS fact
+ORDER BY e.uuid
+"""
+
+
+def pack_strings(strings: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """UTF-8 blob plus offsets; string ``i`` is ``blob[offsets[i]:offsets[i + 1]]``."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_string(blob: np.ndarray, offsets: np.ndarray, i: int) -> str:
+    return blob[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+
+def build_csr(sources: np.ndarray, targets: np.ndarray, n_nodes: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """``(indptr, indices, order)``: node ``i``'s neighbours are ``indices[indptr[i]:indptr[i + 1]]``.
+
+    ``order`` maps CSR positions back to the input edge positions.
+    """
+    order = np.argsort(sources, kind="stable")
+    indptr = np.searchsorted(sources[order], np.arange(n_nodes + 1)).astype(np.int64)
+    return indptr, targets[order].astype(np.int32), order
+
+
+def snapshot_arrays(group_id: str, nodes: list[dict], edges: list[dict]) -> dict[str, np.ndarray]:
+    """Columnar arrays for a snapshot: node columns, embeddings and forward/reverse CSR per edge type.
+
+    ``nodes`` are dicts with uuid, name, label, summary, attributes and embedding;
+    ``edges`` have source/target uuids, name (the edge type) and fact.
+    """
+    index = {node["uuid"]: i for i, node in enumerate(nodes)}
+    label_names = sorted({node["label"] for node in nodes})
+    dim = max((len(node["embedding"]) for node in nodes if node.get("embedding")), default=0)
+    embeddings = np.zeros((len(nodes), dim), dtype=np.float32)
+    for i, node in enumerate(nodes):
+        if node.get("embedding"):
+            vector = np.asarray(node["embedding"], dtype=np.float32)
+            embeddings[i] = vector / (np.linalg.norm(vector) or 1.0)
+
+    arrays = {
+        "group_id": np.array(group_id),
+        "label_names": np.array(label_names),
+        "node_label": np.array([label_names.index(node["label"]) for node in nodes], dtype=np.int16),
+        "embeddings": embeddings,
+    }
+    for column, values in (
+        ("uuid", [node["uuid"] for node in nodes]),
+        ("name", [node["name"] or "" for node in nodes]),
+        ("summary", [node.get("summary") or "" for node in nodes]),
+        ("attributes", [json.dumps(node.get("attributes") or {}, default=str) for node in nodes]),
+    ):
+        arrays[f"node_{column}"], arrays[f"node_{column}_offsets"] = pack_strings(values)
+
+    # Edges whose endpoints fell outside the group are dropped
+    edges = [e for e in edges if e["source"] in index and e["target"] in index and e.get("name")]
+    edge_types = sorted({e["name"] for e in edges})
+    arrays["edge_types"] = np.array(edge_types)
+    for edge_type in edge_types:
+        typed = [e for e in edges if e["name"] == edge_type]
+        sources = np.array([index[e["source"]] for e in typed], dtype=np.int32)
+        targets = np.array([index[e["target"]] for e in typed], dtype=np.int32)
+        indptr, indices, order = build_csr(sources, targets, len(nodes))
+        arrays[f"out_{edge_type}_indptr"], arrays[f"out_{edge_type}_indices"] = indptr, indices
+        facts = [typed[i].get("fact") or "" for i in order]
+        arrays[f"out_{edge_type}_facts"], arrays[f"out_{edge_type}_facts_offsets"] = pack_strings(facts)
+        indptr, indices, _ = build_csr(targets, sources, len(nodes))
+        arrays[f"in_{edge_type}_indptr"], arrays[f"in_{edge_type}_indices"] = indptr, indices
+    return arrays
+
+
+def save_snapshot(path: str, arrays: dict[str, np.ndarray]):
+    """Write to a temporary file and rename into place, so readers never load a half-written snapshot."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def primary_label(labels: list[str]) -> str:
+    return next((label for label in labels if label != "Entity"), "Entity")
+
+
+async def export_snapshot(driver, group_id: str = "procedures", path: str = GRAPH_SNAPSHOT_PATH) -> tuple[int, int]:
+    """Snapshot a group's entity nodes and live edges from Neo4j to ``path``; returns ``(nodes, edges)``."""
+    node_records, _, _ = await driver.execute_query(NODES_QUERY, group_id=group_id, routing_="r")
+    edge_records, _, _ = await driver.execute_query(EDGES_QUERY, group_id=group_id, routing_="r")
+    nodes = []
+    for record in node_records:
+        properties = record["properties"]
+        nodes.append({
+            "uuid": record["uuid"],
+            "name": properties.get("name"),
+            "label": primary_label(record["labels"]),
+            "summary": properties.get("summary"),
+            "attributes": {k: v for k, v in properties.items() if k not in _NODE_FIELDS and v is not None},
+            "embedding": properties.get("name_embedding"),
+        })
+    edges = [dict(record) for record in edge_records]
+    save_snapshot(path, snapshot_arrays(group_id, nodes, edges))
+    logger.info(f"Wrote graph snapshot of '{group_id}' to {path}: {len(nodes)} nodes, {len(edges)} edges")
+    return len(nodes), len(edges)
+
+
+async def refresh_snapshot(driver, group_id: str = "procedures"):
+    """Re-export after ingestion; failures are logged, never raised, so they can't fail the run."""
+    if not GRAPH_SNAPSHOT_EXPORT:
+        return
+    try:
+        await export_snapshot(driver, group_id)
+    except Exception as e:
+        logger.warning(f"Could not export graph snapshot of '{group_id}': {e}")
+
+
+class GraphSnapshot:
+    """In-process, read-only copy of one group's graph for neighbourhood queries without Neo4j.
+
+    Nodes are integer ids into columnar arrays. Each edge type has forward
+    (source -> target) and reverse CSR adjacency, so a hop is a slice per
+    frontier node and an intersection is a boolean mask per constraint.
+    Edge types in a path are followed backwards when prefixed with ``~``.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.group_id = str(arrays["group_id"])
+        self.label_names = [str(label) for label in arrays["label_names"]]
+        self.node_label = arrays["node_label"]
+        self.embeddings = arrays["embeddings"]
+        self.edge_types = {str(t) for t in arrays["edge_types"]}
+        self.names = [
+            unpack_string(arrays["node_name"], arrays["node_name_offsets"], i) for i in range(len(self.node_label))
+        ]
+        self._by_name: dict[str, list[int]] = {}
+        for i, name in enumerate(self.names):
+            self._by_name.setdefault(normalize_query(name), []).append(i)
+
+    @classmethod
+    def load(cls, path: str = GRAPH_SNAPSHOT_PATH) -> "GraphSnapshot":
+        with np.load(path) as npz:
+            return cls({key: npz[key] for key in npz.files})
+
+    def __len__(self):
+        return len(self.names)
+
+    def label(self, i: int) -> str:
+        return self.label_names[self.node_label[i]]
+
+    def node(self, i: int) -> dict:
+        a = self.arrays
+        return {
+            "name": self.names[i],
+            "group_id": self.group_id,
+            "label": self.label(i),
+            "summary": unpack_string(a["node_summary"], a["node_summary_offsets"], i),
+            "attributes": json.loads(unpack_string(a["node_attributes"], a["node_attributes_offsets"], i)),
+        }
+
+    def find(self, name: str, label: str | None = None) -> list[int]:
+        """Node ids whose name matches ``name`` (case and punctuation insensitive)."""
+        ids = self._by_name.get(normalize_query(name), [])
+        return [i for i in ids if label is None or self.label(i) == label]
+
+    def _csr(self, edge_type: str):
+        reverse = edge_type.startswith("~")
+        edge_type = edge_type.lstrip("~")
+        if edge_type not in self.edge_types:
+            raise ValueError(f"Unknown edge type '{edge_type}'; snapshot has {sorted(self.edge_types)}")
+        prefix = "in" if reverse else "out"
+        return self.arrays[f"{prefix}_{edge_type}_indptr"], self.arrays[f"{prefix}_{edge_type}_indices"]
+
+    def hop(self, frontier: np.ndarray, edge_type: str) -> np.ndarray:
+        """Distinct neighbours of every node in ``frontier`` over ``edge_type`` (``~`` for reverse)."""
+        indptr, indices = self._csr(edge_type)
+        if not len(frontier):
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate([indices[indptr[i]:indptr[i + 1]] for i in frontier]))
+
+    def traverse(self, name: str, path: list[str], label: str | None = None, limit: int = 50) -> list[dict]:
+        """Nodes reached from ``name`` by following ``path`` hop by hop, e.g. ``["TREATS_AREA", "~TREATS_AREA"]``
+        for procedures that treat the same areas."""
+        start = np.array(self.find(name), dtype=np.int32)
+        frontier = start
+        for edge_type in path:
+            frontier = self.hop(frontier, edge_type)
+        if len(path) > 1:
+            frontier = np.setdiff1d(frontier, start)
+        return [self.node(int(i)) for i in frontier if label is None or self.label(int(i)) == label][:limit]
+
+    def facts(self, i: int, edge_type: str) -> list[dict]:
+        """Outgoing ``edge_type`` edges of node ``i`` with their facts."""
+        indptr, indices = self._csr(edge_type)
+        blob, offsets = self.arrays[f"out_{edge_type}_facts"], self.arrays[f"out_{edge_type}_facts_offsets"]
+        return [
+            {"relation": edge_type, "name": self.names[int(indices[p])], "fact": unpack_string(blob, offsets, p)}
+            for p in range(indptr[i], indptr[i + 1])
+        ]
+
+    def connected_to_all(self, constraints: list[tuple[str, str]], label: str | None = "Procedure",
+                         limit: int = 50) -> list[dict]:
+        """Nodes with an outgoing edge of each ``(edge_type, neighbour name)`` pair, e.g.
+        ``[("TREATS_AREA", "Lips"), ("ACCEPTS_PAYMENT", "AfterPay")]``."""
+        mask = np.ones(len(self), dtype=bool)
+        if label is not None:
+            mask &= self.node_label == (self.label_names.index(label) if label in self.label_names else -1)
+        for edge_type, name in constraints:
+            matched = np.zeros(len(self), dtype=bool)
+            matched[self.hop(np.array(self.find(name), dtype=np.int32), f"~{edge_type}")] = True
+            mask &= matched
+        return [self.node(int(i)) for i in np.flatnonzero(mask)[:limit]]
+
+    def search(self, query_embedding, label: str | None = None, k: int = 5) -> list[dict]:
+        """Nearest nodes by name embedding (cosine)."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        # A snapshot exported with another embedding model can't be compared
+        if not len(self) or self.embeddings.shape[1] != len(query):
+            return []
+        scores = self.embeddings @ (query / (np.linalg.norm(query) or 1.0))
+        if label is not None:
+            label_id = self.label_names.index(label) if label in self.label_names else -1
+            scores = np.where(self.node_label == label_id, scores, -np.inf)
+        order = np.argsort(-scores)[:k]
+        return [{**self.node(int(i)), "score": float(scores[i])} for i in order if np.isfinite(scores[i])]
+
+
+class SnapshotStore:
+    """Current snapshot for the API, swapped for a newer file when ingestion rewrites it.
+
+    ``get()`` checks the file at most every ``check_seconds``. Inside an event
+    loop the check and any reload run in a worker thread, and ``get()`` keeps
+    returning the current snapshot meanwhile. A reload builds the new
+    ``GraphSnapshot`` completely before replacing the reference, so requests
+    see either the old graph or the new one.
+    """
+
+    def __init__(self, path: str = GRAPH_SNAPSHOT_PATH, check_seconds: float = GRAPH_SNAPSHOT_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.snapshot: GraphSnapshot | None = None
+        self.loaded_mtime = None
+        self.reloads = 0
+        self._checked_at = 0.0
+        self._reload_task: asyncio.Task | None = None
+
+    def get(self) -> GraphSnapshot | None:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_seconds:
+            self._checked_at = now
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                self.reload()
+            else:
+                if self._reload_task is None or self._reload_task.done():
+                    self._reload_task = asyncio.create_task(asyncio.to_thread(self.reload))
+        return self.snapshot
+
+    def reload(self, force: bool = False) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self.loaded_mtime and not force:
+            return False
+        try:
+            snapshot = GraphSnapshot.load(self.path)
+        except Exception as e:
+            logger.warning(f"Could not load graph snapshot {self.path}, keeping the current one: {e}")
+            return False
+        self.snapshot, self.loaded_mtime = snapshot, mtime
+        self.reloads += 1
+        logger.info(f"Loaded graph snapshot {self.path}: {len(snapshot)} nodes")
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "nodes": len(self.snapshot) if self.snapshot else 0,
+            "edge_types": sorted(self.snapshot.edge_types) if self.snapshot else [],
+            "reloads": self.reloads,
+        }
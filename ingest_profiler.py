@@ -0,0 +1,473 @@
+"""Per-episode profile of an ingestion run: LLM, embedding and Neo4j time, calls, tokens and writes.
+
+``install_profiler(graphiti)`` wraps the Graphiti LLM client, embedder and
+Neo4j driver. Everything they do inside ``with profiler.episode(fname):`` is
+charged to that record, including the tasks Graphiti fans out during
+``add_episode`` (they inherit the context), so concurrent workers don't mix
+their numbers. At the end of the run ``profiler.write_report()`` writes
+``INGEST_PROFILE_PATH``.csv (one row per record, sortable) and .json
+(percentiles, slowest records, prompts using the most tokens), and
+``profiler.close()`` removes the hooks again.
+
+    python ingest_profiler.py [report.json] [column]    # top records by column
+
+Token counts come from the OpenAI ``usage`` of each response. Calls answered
+by the LLM/embedding caches make no API request and are counted with a
+chars/4 estimate, flagged in ``llm_estimated_calls``. Neo4j counts cover both
+``execute_query`` and the managed transactions of ``driver.session()``, which
+is how ``add_episode`` writes its nodes and edges. LLM and Neo4j seconds
+are summed over calls, so with Graphiti's internal concurrency they can
+exceed the record's wall time.
+"""
+import contextvars
+import csv
+import heapq
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Set to "0" to ingest without profiling hooks
+INGEST_PROFILE = os.environ.get('INGEST_PROFILE', '1') != '0'
+# Report path without extension; .csv and .json are written next to each other
+INGEST_PROFILE_PATH = os.environ.get('INGEST_PROFILE_PATH', 'ingest_profile')
+INGEST_PROFILE_TOP = int(os.environ.get('INGEST_PROFILE_TOP', '10'))
+# USD per million tokens, for the cost estimate; 0 leaves cost out
+INGEST_PROFILE_INPUT_USD_PER_MTOK = float(os.environ.get('INGEST_PROFILE_INPUT_USD_PER_MTOK', '0'))
+INGEST_PROFILE_OUTPUT_USD_PER_MTOK = float(os.environ.get('INGEST_PROFILE_OUTPUT_USD_PER_MTOK', '0'))
+
+COLUMNS = (
+    "file", "name", "status", "wall_seconds",
+    "llm_calls", "llm_estimated_calls", "llm_seconds", "llm_prompt_tokens", "llm_completion_tokens",
+    "embed_calls", "embed_texts", "embed_seconds", "embed_tokens",
+    "neo4j_queries", "neo4j_seconds", "neo4j_write_queries", "neo4j_nodes_created",
+    "neo4j_relationships_created", "neo4j_properties_set", "neo4j_deleted",
+    "cost_usd",
+)
+PERCENTILE_COLUMNS = (
+    "wall_seconds", "llm_seconds", "llm_calls", "llm_prompt_tokens", "llm_completion_tokens",
+    "embed_seconds", "embed_texts", "neo4j_seconds", "neo4j_queries", "neo4j_write_queries", "cost_usd",
+)
+
+_EPISODE: contextvars.ContextVar = contextvars.ContextVar("ingest_profile_episode", default=None)
+# Usage sink of the LLM/embedding call in progress, filled in by the OpenAI client hooks
+_CALL: contextvars.ContextVar = contextvars.ContextVar("ingest_profile_call", default=None)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def cost_usd(prompt_tokens: int, completion_tokens: int) -> float:
+    return (prompt_tokens * INGEST_PROFILE_INPUT_USD_PER_MTOK
+            + completion_tokens * INGEST_PROFILE_OUTPUT_USD_PER_MTOK) / 1_000_000
+
+
+class EpisodeProfile:
+    """Counters for one record; ``row()`` is its CSV/JSON line."""
+
+    def __init__(self, fname: str, name: str | None = None):
+        self.fname = fname
+        self.name = name
+        self.status = "success"
+        self.wall_seconds = 0.0
+        self.counters = {column: 0 for column in COLUMNS[4:-1]}
+
+    def add(self, **values):
+        for column, value in values.items():
+            self.counters[column] += value
+
+    def row(self) -> dict:
+        row = {"file": self.fname, "name": self.name, "status": self.status,
+               "wall_seconds": round(self.wall_seconds, 3)}
+        for column, value in self.counters.items():
+            row[column] = round(value, 3) if isinstance(value, float) else value
+        row["cost_usd"] = round(cost_usd(row["llm_prompt_tokens"], row["llm_completion_tokens"]), 6)
+        return row
+
+
+def label_episode(name: str | None):
+    """Name the record being profiled, if any (callers don't need to know whether profiling is on)."""
+    profile = _EPISODE.get()
+    if profile is not None:
+        profile.name = name
+
+
+def _usage_hook(resource, method: str, tokens_of, undo: list):
+    """Wrap ``resource.method`` of an OpenAI client so each response's usage lands in the current call's sink.
+
+    Appends to ``undo`` a callable that puts the original method back.
+    """
+    original = getattr(resource, method, None)
+    if original is None or getattr(original, "_profiled", False):
+        return
+    shadowed = method in vars(resource)
+
+    async def hooked(*args, **kwargs):
+        response = await original(*args, **kwargs)
+        sink = _CALL.get()
+        usage = getattr(response, "usage", None)
+        if sink is not None and usage is not None:
+            for key, value in tokens_of(usage).items():
+                sink[key] = (sink[key] or 0) + (value or 0)
+        return response
+
+    hooked._profiled = True
+    setattr(resource, method, hooked)
+
+    def restore():
+        if shadowed:
+            setattr(resource, method, original)
+        else:
+            delattr(resource, method)
+
+    undo.append(restore)
+
+
+def _innermost(client):
+    # Through the cache wrappers to the Graphiti client that owns the OpenAI client
+    while "inner" in vars(client):
+        client = vars(client)["inner"]
+    return client
+
+
+class ProfilingLLMClient:
+    """Times every ``generate_response`` and charges it, with its tokens, to the current record."""
+
+    def __init__(self, inner, profiler: "IngestProfiler"):
+        self.inner = inner
+        self.profiler = profiler
+        openai_client = getattr(_innermost(inner), "client", None)
+        chat = getattr(openai_client, "chat", None)
+        beta_chat = getattr(getattr(openai_client, "beta", None), "chat", None)
+        tokens_of = lambda usage: {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+        if beta_chat is not None:
+            _usage_hook(beta_chat.completions, "parse", tokens_of, profiler.undo)
+        if chat is not None:
+            _usage_hook(chat.completions, "create", tokens_of, profiler.undo)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    async def generate_response(self, messages, response_model=None, max_tokens=None, model_size=None, **kwargs):
+        if model_size is not None:
+            kwargs["model_size"] = model_size
+        sink = {"prompt_tokens": None, "completion_tokens": None}
+        token = _CALL.set(sink)
+        start = time.perf_counter()
+        try:
+            response = await self.inner.generate_response(messages, response_model=response_model,
+                                                          max_tokens=max_tokens, **kwargs)
+        except BaseException:
+            # Failed attempts still cost time and, when the API answered, tokens
+            self.profiler.current().add(llm_calls=1, llm_seconds=time.perf_counter() - start,
+                                        llm_prompt_tokens=sink["prompt_tokens"] or 0,
+                                        llm_completion_tokens=sink["completion_tokens"] or 0)
+            raise
+        finally:
+            _CALL.reset(token)
+        seconds = time.perf_counter() - start
+        estimated = sink["prompt_tokens"] is None
+        if estimated:
+            # Cached or no usage reported: the clients append the schema to messages, so this counts it too
+            sink["prompt_tokens"] = sum(estimate_tokens(m.content) for m in messages)
+            sink["completion_tokens"] = estimate_tokens(json.dumps(response, ensure_ascii=False))
+        prompt = response_model.__name__ if response_model is not None else "text"
+        self.profiler.record_llm(prompt, seconds, sink["prompt_tokens"], sink["completion_tokens"], estimated)
+        return response
+
+
+class ProfilingEmbedder:
+    """Times ``create``/``create_batch`` and charges the texts and tokens to the current record."""
+
+    def __init__(self, inner, profiler: "IngestProfiler"):
+        self.inner = inner
+        self.profiler = profiler
+        self.config = getattr(inner, "config", None)
+        embeddings = getattr(getattr(_innermost(inner), "client", None), "embeddings", None)
+        if embeddings is not None:
+            _usage_hook(embeddings, "create", lambda usage: {"prompt_tokens": usage.prompt_tokens}, profiler.undo)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    async def _timed(self, call, texts: int):
+        sink = {"prompt_tokens": None}
+        token = _CALL.set(sink)
+        start = time.perf_counter()
+        try:
+            return await call
+        finally:
+            _CALL.reset(token)
+            self.profiler.current().add(embed_calls=1, embed_texts=texts, embed_seconds=time.perf_counter() - start,
+                                        embed_tokens=sink["prompt_tokens"] or 0)
+
+    async def create(self, input_data):
+        return await self._timed(self.inner.create(input_data), 1)
+
+    async def create_batch(self, input_data_list: list[str]) -> list[list[float]]:
+        return await self._timed(self.inner.create_batch(input_data_list), len(input_data_list))
+
+
+def _add_writes(profile: EpisodeProfile, counters):
+    if counters is not None and counters.contains_updates:
+        profile.add(
+            neo4j_write_queries=1,
+            neo4j_nodes_created=counters.nodes_created,
+            neo4j_relationships_created=counters.relationships_created,
+            neo4j_properties_set=counters.properties_set,
+            neo4j_deleted=counters.nodes_deleted + counters.relationships_deleted,
+        )
+
+
+class ProfilingTransaction:
+    """Managed-transaction proxy that keeps the result of every ``run`` for its summary counters."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.results = []
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    async def run(self, *args, **kwargs):
+        result = await self.inner.run(*args, **kwargs)
+        self.results.append(result)
+        return result
+
+
+class ProfilingSession:
+    """``AsyncSession`` proxy timing ``execute_write``/``execute_read`` and counting their queries and writes."""
+
+    def __init__(self, inner, profiler: "IngestProfiler"):
+        self.inner = inner
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    async def __aenter__(self):
+        await self.inner.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self.inner.__aexit__(*exc_info)
+
+    async def _execute(self, execute, transaction_function, args, kwargs):
+        queries = 0
+        counters = []
+
+        async def work(tx, *tx_args, **tx_kwargs):
+            nonlocal queries
+            # A retried attempt starts over; only the committed attempt's writes count
+            counters.clear()
+            profiled = ProfilingTransaction(tx)
+            try:
+                value = await transaction_function(profiled, *tx_args, **tx_kwargs)
+            finally:
+                queries += len(profiled.results)
+            for result in profiled.results:
+                # Still inside the transaction, and the function is done with its results
+                counters.append((await result.consume()).counters)
+            return value
+
+        start = time.perf_counter()
+        try:
+            value = await execute(work, *args, **kwargs)
+        finally:
+            self.profiler.current().add(neo4j_queries=queries, neo4j_seconds=time.perf_counter() - start)
+        for query_counters in counters:
+            _add_writes(self.profiler.current(), query_counters)
+        return value
+
+    async def execute_write(self, transaction_function, *args, **kwargs):
+        return await self._execute(self.inner.execute_write, transaction_function, args, kwargs)
+
+    async def execute_read(self, transaction_function, *args, **kwargs):
+        return await self._execute(self.inner.execute_read, transaction_function, args, kwargs)
+
+
+class ProfilingDriver:
+    """Neo4j ``AsyncDriver`` proxy timing ``execute_query`` and session transactions, and reading their write
+    counters."""
+
+    def __init__(self, inner, profiler: "IngestProfiler"):
+        self.inner = inner
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def session(self, *args, **kwargs):
+        return ProfilingSession(self.inner.session(*args, **kwargs), self.profiler)
+
+    async def execute_query(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await self.inner.execute_query(*args, **kwargs)
+        finally:
+            self.profiler.current().add(neo4j_queries=1, neo4j_seconds=time.perf_counter() - start)
+        _add_writes(self.profiler.current(), getattr(getattr(result, "summary", None), "counters", None))
+        return result
+
+
+class IngestProfiler:
+    """Collects an ``EpisodeProfile`` per record, plus one for work done outside any record."""
+
+    def __init__(self, top: int = INGEST_PROFILE_TOP):
+        self.top = top
+        self.episodes: list[EpisodeProfile] = []
+        self.outside = EpisodeProfile("(outside records)")
+        self.outside.status = "outside"
+        self.prompts: dict[str, dict] = {}
+        # Min-heap of the LLM calls with the most tokens: (tokens, sequence, call)
+        self._top_calls: list[tuple[int, int, dict]] = []
+        self._sequence = 0
+        self.started = time.perf_counter()
+        # Callables that take the hooks back out, run by close()
+        self.undo: list = []
+
+    def current(self) -> EpisodeProfile:
+        return _EPISODE.get() or self.outside
+
+    @contextmanager
+    def episode(self, fname: str, name: str | None = None):
+        """Charge everything done inside the block to ``fname``; yields its profile to set ``name``/``status``."""
+        profile = EpisodeProfile(fname, name)
+        token = _EPISODE.set(profile)
+        start = time.perf_counter()
+        try:
+            yield profile
+        except BaseException:
+            profile.status = "failed"
+            raise
+        finally:
+            profile.wall_seconds = time.perf_counter() - start
+            _EPISODE.reset(token)
+            self.episodes.append(profile)
+
+    def record_llm(self, prompt: str, seconds: float, prompt_tokens: int, completion_tokens: int, estimated: bool):
+        profile = self.current()
+        profile.add(llm_calls=1, llm_estimated_calls=int(estimated), llm_seconds=seconds,
+                    llm_prompt_tokens=prompt_tokens, llm_completion_tokens=completion_tokens)
+        totals = self.prompts.setdefault(prompt, {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+        totals["calls"] += 1
+        totals["seconds"] += seconds
+        totals["prompt_tokens"] += prompt_tokens
+        totals["completion_tokens"] += completion_tokens
+        self._sequence += 1
+        call = {"file": profile.fname, "prompt": prompt, "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens, "seconds": round(seconds, 3), "estimated": estimated}
+        entry = (prompt_tokens + completion_tokens, self._sequence, call)
+        if len(self._top_calls) < self.top:
+            heapq.heappush(self._top_calls, entry)
+        else:
+            heapq.heappushpop(self._top_calls, entry)
+
+    def report(self) -> dict:
+        rows = [profile.row() for profile in self.episodes]
+        added = [row for row in rows if row["status"] == "success"]
+        percentiles = {}
+        for column in PERCENTILE_COLUMNS:
+            values = np.array([row[column] for row in added], dtype=float)
+            if len(values):
+                percentiles[column] = {f"p{p}": round(float(np.percentile(values, p)), 3) for p in (50, 90, 99)}
+                percentiles[column]["max"] = round(float(values.max()), 3)
+        totals = {column: round(sum(row[column] for row in rows + [self.outside.row()]), 6 if column == "cost_usd" else 3)
+                  for column in COLUMNS[3:]}
+        prompts = {
+            name: {**p, "seconds": round(p["seconds"], 3),
+                   "cost_usd": round(cost_usd(p["prompt_tokens"], p["completion_tokens"]), 6)}
+            for name, p in sorted(self.prompts.items(), key=lambda item: -(item[1]["prompt_tokens"]
+                                                                            + item[1]["completion_tokens"]))
+        }
+        return {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "run_seconds": round(time.perf_counter() - self.started, 3),
+            "records": len(rows),
+            "added": len(added),
+            "totals": totals,
+            "outside_records": self.outside.row(),
+            "percentiles": percentiles,
+            "slowest": sorted(added, key=lambda row: -row["wall_seconds"])[:self.top],
+            "prompts": prompts,
+            "top_token_calls": [call for _, _, call in sorted(self._top_calls, reverse=True)],
+            "episodes": rows,
+        }
+
+    def write_report(self, path: str = INGEST_PROFILE_PATH) -> dict | None:
+        """Write ``path``.csv and ``path``.json and log the headline numbers. Failures are logged, never raised."""
+        try:
+            report = self.report()
+            with open(f"{path}.csv", "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=COLUMNS)
+                writer.writeheader()
+                writer.writerows(report["episodes"])
+            with open(f"{path}.json", "w") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"Could not write ingestion profile to {path}: {e}")
+            return None
+        wall = report["percentiles"].get("wall_seconds", {})
+        logger.info(f"Ingestion profile: {report['added']} records added, wall p50 {wall.get('p50')}s "
+                    f"p90 {wall.get('p90')}s max {wall.get('max')}s, totals {report['totals']}. "
+                    f"Report in {path}.csv / {path}.json")
+        for row in report["slowest"][:3]:
+            logger.info(f"Slow record {row['file']}: {row['wall_seconds']}s, {row['llm_calls']} LLM calls "
+                        f"({row['llm_seconds']}s), {row['neo4j_queries']} Neo4j queries ({row['neo4j_seconds']}s)")
+        return report
+
+    def close(self):
+        """Undo ``install_profiler``: put back the unwrapped clients and the original OpenAI methods."""
+        while self.undo:
+            self.undo.pop()()
+
+
+def _swap(graphiti, attribute: str, wrap, undo: list):
+    inner = getattr(graphiti, attribute)
+    wrapped = wrap(inner)
+    setattr(graphiti, attribute, wrapped)
+    setattr(graphiti.clients, attribute, wrapped)
+
+    def restore():
+        setattr(graphiti, attribute, inner)
+        setattr(graphiti.clients, attribute, inner)
+
+    undo.append(restore)
+
+
+def install_profiler(graphiti, top: int = INGEST_PROFILE_TOP) -> IngestProfiler | None:
+    """Wrap a Graphiti instance's LLM client, embedder and driver; install after the caches so hits are seen.
+
+    Returns the profiler, or ``None`` when ``INGEST_PROFILE`` is off. Call
+    ``profiler.close()`` when the run ends to unwrap the clients and take the
+    hooks back off the OpenAI clients, which may be shared with other code.
+    """
+    if not INGEST_PROFILE:
+        return None
+    profiler = IngestProfiler(top)
+    if getattr(graphiti, "llm_client", None) is not None:
+        _swap(graphiti, "llm_client", lambda inner: ProfilingLLMClient(inner, profiler), profiler.undo)
+    _swap(graphiti, "embedder", lambda inner: ProfilingEmbedder(inner, profiler), profiler.undo)
+    _swap(graphiti, "driver", lambda inner: ProfilingDriver(inner, profiler), profiler.undo)
+    return profiler
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else f"{INGEST_PROFILE_PATH}.json"
+    column = sys.argv[2] if len(sys.argv) > 2 else "wall_seconds"
+    with open(path, "r") as f:
+        report = json.load(f)
+    if column not in COLUMNS[3:]:
+        sys.exit(f"column must be one of {', '.join(COLUMNS[3:])}")
+    print(f"{report['added']} records added in {report['run_seconds']}s; totals {report['totals']}")
+    for row in sorted(report["episodes"], key=lambda row: -row[column])[:INGEST_PROFILE_TOP]:
+        print(f"{row[column]:>12}  {row['file']}  ({row['status']}, {row['wall_seconds']}s, "
+              f"{row['llm_calls']} LLM calls, {row['llm_prompt_tokens']}+{row['llm_completion_tokens']} tokens)")
@@ -15,18 +15,41 @@ limitations under the License.
 """
 
 import asyncio
+import contextlib
 import json
 import logging
 import os
+import traceback
 from datetime import datetime, timezone
 from logging import INFO
 
 from dotenv import load_dotenv
 
 from graphiti_core import Graphiti
+from graphiti_core.llm_client.errors import RateLimitError
 from graphiti_core.nodes import EpisodeType
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+from openai import APIConnectionError, APITimeoutError, InternalServerError
+from openai import RateLimitError as OpenAIRateLimitError
 from pydantic import BaseModel, Field
 
+from ingestion_manifest import (
+    INGEST_PRUNE_REMOVED,
+    IngestionManifest,
+    content_hash,
+    episode_uuids,
+    prune_removed,
+    remove_episodes,
+)
+from rate_limit import AsyncRateLimiter, retry_with_backoff
+from answer_snippets import write_snippets
+from dedup_records import without_duplicates
+from embedding_cache import install_embedding_cache
+from llm_cache import install_llm_cache
+from ingest_profiler import install_profiler, label_episode
+from graph_snapshot import refresh_snapshot
+from search_cache import invalidate_remote_cache
+
 # CONFIGURATION
 logging.basicConfig(
     level=INFO,
@@ -44,6 +67,23 @@ neo4j_password = os.environ.get('NEO4J_PASSWORD', 'password')
 
 logger.info(f"Graphiti connection config: uri={neo4j_uri}, user={neo4j_user}")
 
+# Worker-pool settings. INGEST_WORKERS=1 keeps the original one-file-at-a-time behaviour.
+# add_episode itself stays one at a time per group (see group_lock); workers only overlap the rest.
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', '1'))
+INGEST_RATE_PER_SEC = float(os.environ.get('INGEST_RATE_PER_SEC', '2'))
+INGEST_MAX_ATTEMPTS = int(os.environ.get('INGEST_MAX_ATTEMPTS', '4'))
+
+TRANSIENT_ERRORS = (
+    RateLimitError,
+    OpenAIRateLimitError,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    ServiceUnavailable,
+    SessionExpired,
+    TransientError,
+)
+
 # Define Pydantic models for the nodes
 class Procedure(BaseModel):
     """A cosmetic procedure offered by the clinic."""
@@ -118,6 +158,66 @@ def get_json_files(directory):
     files.sort()
     return files
 
+# graphiti-core requires a group's episodes to be added one after another: each one's node/edge
+# dedup must see the entities of the previous one, or overlapping adds create duplicate nodes
+_GROUP_LOCKS: dict[str, asyncio.Lock] = {}
+
+
+def group_lock(group_id):
+    return _GROUP_LOCKS.setdefault(group_id, asyncio.Lock())
+
+
+async def ingest_file(graphiti, docs_dir, fname, i, manifest, limiter):
+    """Add one docs_kb record as an episode.
+
+    Returns 'success', 'skip' (no 'json' field) or 'unchanged' (hash matches the manifest).
+    """
+    fpath = os.path.join(docs_dir, fname)
+    with open(fpath, 'r') as f:
+        data = json.load(f)
+    content = data.get('json')
+    if not content:
+        logger.warning(f"[SKIP] No 'json' field in {fname} (index {i})")
+        return 'skip'
+    digest = content_hash(content)
+    if manifest.is_current(fname, digest):
+        logger.info(f"[UNCHANGED] {fname} matches the ingestion manifest")
+        return 'unchanged'
+    episode_body = content.copy()
+    episode_name = content.get('procedure_name', f"Procedure {i+1}")
+    label_episode(episode_name)
+    logger.info(f"Adding episode: name='{episode_name}' from file '{fname}'")
+
+    async def add_episode(**kwargs):
+        # Every attempt, retries included, waits for its own rate-limit token
+        await limiter.acquire()
+        async with group_lock(kwargs["group_id"]):
+            return await graphiti.add_episode(**kwargs)
+
+    episode = await retry_with_backoff(
+        add_episode,
+        name=episode_name,
+        episode_body=json.dumps(compress_procedure(episode_body), ensure_ascii=False),
+        source=EpisodeType.json,
+        source_description='procedure metadata',
+        reference_time=datetime.now(timezone.utc),
+        group_id="procedures",
+        entity_types=entity_types,
+        edge_types=edge_types,
+        edge_type_map=edge_type_map,
+        retry_on=TRANSIENT_ERRORS,
+        max_attempts=INGEST_MAX_ATTEMPTS,
+        description=f"add_episode({fname})",
+    )
+    # A changed record replaces the episodes it produced last time, once the new one is in the graph
+    async with group_lock("procedures"):
+        await remove_episodes(graphiti, manifest.previous_episodes(fname))
+    uuids = episode_uuids(episode)
+    manifest.record(fname, digest, uuids)
+    logger.info(f"[SUCCESS] Added episode from {fname}: {uuids or episode}")
+    return 'success'
+
+
 async def main():
     if not neo4j_uri or not neo4j_user or not neo4j_password:
         logger.error('NEO4J_URI, NEO4J_USER, and NEO4J_PASSWORD must be set')
@@ -125,54 +225,74 @@ async def main():
 
     logger.info("Opening connection to Graphiti...")
     graphiti = Graphiti(neo4j_uri, neo4j_user, neo4j_password)
+    embedding_cache = install_embedding_cache(graphiti)
+    llm_cache = install_llm_cache(graphiti)
+    # Outermost, so cache hits are profiled as calls that cost no API time
+    profiler = install_profiler(graphiti)
     success_count = 0
     skip_count = 0
+    unchanged_count = 0
     fail_count = 0
     try:
         await graphiti.build_indices_and_constraints()
         docs_dir = "docs_kb"
-        files = get_json_files(docs_dir)
+        files = without_duplicates(get_json_files(docs_dir), docs_dir=docs_dir)
 
         logger.info(f"Found {len(files)} files to process in '{docs_dir}'.")
 
+        manifest = IngestionManifest()
+        if INGEST_PRUNE_REMOVED:
+            pruned = await prune_removed(graphiti, manifest, files)
+            logger.info(f"Pruned episodes of {pruned} removed records.")
+
+        # A crashed run resumes through the manifest: records it finished match their hashes and are skipped
+        queue = asyncio.Queue()
         for i, fname in enumerate(files):
-            fpath = os.path.join(docs_dir, fname)
-            logger.info(f"[START] Processing file {i+1}/{len(files)}: {fname}")
-            try:
-                with open(fpath, 'r') as f:
-                    data = json.load(f)
-                content = data.get('json')
-                if not content:
-                    logger.warning(f"[SKIP] No 'json' field in {fname} (index {i})")
-                    skip_count += 1
-                    continue
-                episode_body = content.copy()
-                episode_name = content.get('procedure_name', f"Procedure {i+1}")
-                logger.info(f"Adding episode: name='{episode_name}' from file '{fname}'")
-                episode = await graphiti.add_episode(
-                    name=episode_name,
-                    episode_body=json.dumps(compress_procedure(episode_body), ensure_ascii=False),
-                    source=EpisodeType.json,
-                    source_description='procedure metadata',
-                    reference_time=datetime.now(timezone.utc),
-                    group_id="procedures",
-                    entity_types=entity_types,
-                    edge_types=edge_types,
-                    edge_type_map=edge_type_map
-                )
-                # Log the result appropriately
-                if hasattr(episode, 'episodes') and episode.episodes:
-                    logger.info(f"[SUCCESS] Added episode from {fname}: {episode.episodes[0].uuid}")
-                else:
-                    logger.info(f"[SUCCESS] Added episode from {fname}: {episode}")
-                success_count += 1
-            except Exception as e:
-                import traceback
-                logger.error(f"[ERROR] Failed to add {fname} (index {i}): {e}\n{traceback.format_exc()}")
-                fail_count += 1
-            logger.info(f"[END] Finished processing file {i+1}/{len(files)}: {fname}")
-        logger.info(f"Processing complete. Success: {success_count}, Skipped: {skip_count}, Failed: {fail_count}")
+            queue.put_nowait((i, fname))
+        limiter = AsyncRateLimiter(INGEST_RATE_PER_SEC)
+
+        async def worker(worker_id):
+            nonlocal success_count, skip_count, unchanged_count, fail_count
+            while True:
+                try:
+                    i, fname = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                logger.info(f"[START] Worker {worker_id} processing file {i+1}/{len(files)}: {fname}")
+                try:
+                    with profiler.episode(fname) if profiler else contextlib.nullcontext() as profile:
+                        status = await ingest_file(graphiti, docs_dir, fname, i, manifest, limiter)
+                        if profile:
+                            profile.status = status
+                    if status == 'success':
+                        success_count += 1
+                    elif status == 'unchanged':
+                        unchanged_count += 1
+                    else:
+                        skip_count += 1
+                except Exception as e:
+                    logger.error(f"[ERROR] Failed to add {fname} (index {i}): {e}\n{traceback.format_exc()}")
+                    fail_count += 1
+                logger.info(f"[END] Finished processing file {i+1}/{len(files)}: {fname}")
+
+        workers = max(1, INGEST_WORKERS)
+        logger.info(f"Ingesting {queue.qsize()} files with {workers} worker(s).")
+        await asyncio.gather(*[worker(n) for n in range(workers)])
+        logger.info(f"Processing complete. Success: {success_count}, Skipped: {skip_count}, Unchanged: {unchanged_count}, Failed: {fail_count}")
+        if success_count:
+            write_snippets(docs_dir)
+            await refresh_snapshot(graphiti.driver, "procedures")
+            invalidate_remote_cache("procedures")
     finally:
+        if profiler:
+            profiler.write_report()
+            profiler.close()
+        if embedding_cache:
+            await embedding_cache.close()
+            logger.info(f"Embedding cache: {embedding_cache.stats()}")
+        if llm_cache:
+            logger.info(f"LLM cache: {llm_cache.stats()}")
+            llm_cache.close()
         await graphiti.close()
         logger.info('Graphiti connection closed')
 
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+INGEST_MANIFEST = os.environ.get('INGEST_MANIFEST', 'ingest_manifest.json')
+# Remove the episodes of docs_kb records that no longer exist on disk
+INGEST_PRUNE_REMOVED = os.environ.get('INGEST_PRUNE_REMOVED', '').lower() in ('1', 'true', 'yes')
+
+
+def content_hash(content: dict) -> str:
+    """sha256 over the canonical JSON of a record's ``json`` payload."""
+    raw = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def episode_uuids(result) -> list[str]:
+    """Episode UUIDs from a ``graphiti.add_episode`` result."""
+    episode = getattr(result, 'episode', None)
+    if episode is not None and getattr(episode, 'uuid', None):
+        return [episode.uuid]
+    return [e.uuid for e in getattr(result, 'episodes', None) or []]
+
+
+class IngestionManifest:
+    """Per-file content hash and produced episode UUIDs, shared by both ingestion scripts.
+
+    Layout: ``{"records": {fname: {"hash", "episode_uuids", "ingested_at"}}}``.
+    Saved atomically after every change so an interrupted run loses nothing.
+    """
+
+    def __init__(self, path: str = INGEST_MANIFEST):
+        self.path = path
+        self.records: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.records = json.load(f).get('records', {})
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'records': self.records}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def is_current(self, fname: str, digest: str) -> bool:
+        entry = self.records.get(fname)
+        return entry is not None and entry.get('hash') == digest
+
+    def previous_episodes(self, fname: str) -> list[str]:
+        return list(self.records.get(fname, {}).get('episode_uuids', []))
+
+    def record(self, fname: str, digest: str, uuids: list[str], save: bool = True):
+        self.records[fname] = {
+            'hash': digest,
+            'episode_uuids': uuids,
+            'ingested_at': datetime.now(timezone.utc).isoformat(),
+        }
+        if save:
+            self.save()
+
+    def rename(self, old: str, new: str, save: bool = True):
+        """Move a record's entry to a new file name (e.g. after the scraper renames files)."""
+        if old in self.records and new not in self.records:
+            self.records[new] = self.records.pop(old)
+            if save:
+                self.save()
+
+    def forget(self, fname: str):
+        self.records.pop(fname, None)
+        self.save()
+
+    def missing(self, present_files) -> list[str]:
+        present = set(present_files)
+        return sorted(f for f in self.records if f not in present)
+
+
+async def remove_episodes(graphiti, uuids: list[str]):
+    """Delete episodes (and the nodes/edges only they produced); already-gone ones are ignored."""
+    for uuid in uuids:
+        try:
+            await graphiti.remove_episode(uuid)
+            logger.info(f"[REMOVE] Removed episode {uuid}")
+        except Exception as e:
+            logger.warning(f"[REMOVE] Could not remove episode {uuid}: {e}")
+
+
+async def prune_removed(graphiti, manifest: IngestionManifest, present_files) -> int:
+    """Remove episodes of manifest records whose files have disappeared. Returns the record count."""
+    stale = manifest.missing(present_files)
+    for fname in stale:
+        logger.info(f"[PRUNE] {fname} no longer exists; removing its episodes")
+        await remove_episodes(graphiti, manifest.previous_episodes(fname))
+        manifest.forget(fname)
+    return len(stale)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# record: answer from the cache, call the LLM on a miss and store the response
+# replay: answer from the cache only, raise LLMCacheMiss on a miss (offline runs, CI)
+# passthrough: no cache at all
+LLM_CACHE_MODE = os.environ.get('LLM_CACHE_MODE', 'record').lower()
+LLM_CACHE_DIR = os.environ.get('LLM_CACHE_DIR', '.llm_cache')
+LLM_CACHE_MODES = ('record', 'replay', 'passthrough')
+
+# Per-run values Graphiti puts in its prompts: node/edge UUIDs and the episode reference time
+_VOLATILE = re.compile(
+    r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"
+    r"|\b[0-9a-f]{32}\b"
+    r"|\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+)
+
+
+class LLMCacheMiss(LookupError):
+    """Raised in replay mode when a prompt has no recorded response."""
+
+
+def templatize(text: str, aliases: dict[str, str]) -> str:
+    """Replace UUIDs and timestamps with ``<v0>``, ``<v1>``... in order of first appearance."""
+    def alias(match):
+        value = match.group(0)
+        if value not in aliases:
+            aliases[value] = f"<v{len(aliases)}>"
+        return aliases[value]
+    return _VOLATILE.sub(alias, text)
+
+
+class RecordingLLMClient:
+    """Record/replay wrapper around a Graphiti ``LLMClient``, backed by ``diskcache``.
+
+    Keys are ``sha256(model, response schema, max_tokens, prompt messages)``.
+    UUIDs and timestamps in the prompt are aliased before hashing, and the same
+    aliases are applied to the stored response and reversed on a hit, so a
+    re-run against freshly created nodes or a new reference time still replays,
+    and replayed responses point at this run's UUIDs.
+    """
+
+    def __init__(self, inner, directory: str = LLM_CACHE_DIR, mode: str = LLM_CACHE_MODE):
+        if mode not in LLM_CACHE_MODES:
+            raise ValueError(f"LLM_CACHE_MODE must be one of {', '.join(LLM_CACHE_MODES)}, got {mode!r}")
+        import diskcache
+        self.inner = inner
+        self.mode = mode
+        self.disk = diskcache.Cache(directory)
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def __getattr__(self, name):
+        # config, model, small_model... are read straight off the wrapped client
+        return getattr(self.inner, name)
+
+    def _model(self, model_size) -> str:
+        if getattr(model_size, "value", model_size) == "small" and getattr(self.inner, "small_model", None):
+            return self.inner.small_model
+        return str(getattr(self.inner, "model", None) or type(self.inner).__name__)
+
+    def key(self, messages, response_model, max_tokens, model_size, aliases: dict[str, str]) -> str:
+        prompt = [(m.role, templatize(m.content, aliases)) for m in messages]
+        raw = json.dumps({
+            "model": self._model(model_size),
+            "schema": response_model.__name__ if response_model is not None else None,
+            "max_tokens": max_tokens,
+            "messages": prompt,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def generate_response(self, messages, response_model=None, max_tokens=None, model_size=None, **kwargs):
+        call = dict(response_model=response_model, max_tokens=max_tokens, **kwargs)
+        if model_size is not None:
+            call["model_size"] = model_size
+        if self.mode == "passthrough":
+            return await self.inner.generate_response(messages, **call)
+
+        # Key on the prompt as the caller built it; the inner client appends to the messages in place
+        aliases: dict[str, str] = {}
+        key = self.key(messages, response_model, max_tokens, model_size, aliases)
+        restore = {alias: value for value, alias in aliases.items()}
+        entry = self.disk.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.saved_seconds += entry["seconds"]
+            return json.loads(re.sub(r"<v\d+>", lambda m: restore.get(m.group(0), m.group(0)), entry["response"]))
+        self.misses += 1
+        if self.mode == "replay":
+            raise LLMCacheMiss(f"No recorded LLM response for prompt {key[:12]} ({self._model(model_size)})")
+
+        start = time.perf_counter()
+        response = await self.inner.generate_response(messages, **call)
+        seconds = time.perf_counter() - start
+        # Alias only values that came from the prompt, so they map back to the next run's UUIDs
+        stored = json.dumps(response, ensure_ascii=False)
+        for value, alias in aliases.items():
+            stored = stored.replace(value, alias)
+        self.disk.set(key, {"response": stored, "seconds": seconds})
+        return response
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "entries": len(self.disk),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+    def close(self):
+        self.disk.close()
+
+
+def install_llm_cache(graphiti, directory: str = LLM_CACHE_DIR, mode: str = LLM_CACHE_MODE):
+    """Put a ``RecordingLLMClient`` under a Graphiti instance (``add_episode`` reads ``clients.llm_client``).
+
+    Returns the cache, or ``None`` in passthrough mode or when there is no LLM client.
+    """
+    if mode == "passthrough" or getattr(graphiti, "llm_client", None) is None:
+        return None
+    cache = RecordingLLMClient(graphiti.llm_client, directory, mode)
+    graphiti.llm_client = cache
+    graphiti.clients.llm_client = cache
+    return cache
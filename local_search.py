@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from generate_procedures_md import DOCS_DIR, extract_field, get_og_url
+from md_builder import list_json_files, load_json
+
+logger = logging.getLogger(__name__)
+
+LOCAL_SEARCH_EMBEDDINGS = os.environ.get('LOCAL_SEARCH_EMBEDDINGS', 'local_search_embeddings.npz')
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def procedure_document(procedure: dict, metadata: dict) -> dict:
+    """Searchable text plus the name/group_id/summary result shape for one docs_kb record."""
+    name = extract_field(procedure, "procedure_name")
+    summary = (
+        f"{extract_field(procedure, 'explanation')} "
+        f"Procedure type: {extract_field(procedure, 'procedure_type')}. "
+        f"Cost: {extract_field(procedure, 'cost')}. "
+        f"Recovery time: {extract_field(procedure, 'recovery_time')}. "
+        f"Results duration: {extract_field(procedure, 'results_duration')}."
+    )
+    text = "\n".join([
+        name,
+        summary,
+        extract_field(procedure, "treatment_overview"),
+        extract_field(procedure, "miscellaneous_information"),
+    ])
+    return {
+        "name": name,
+        "group_id": "procedures",
+        "summary": summary,
+        "url": get_og_url(metadata),
+        "text": text,
+    }
+
+
+def load_procedure_records(docs_dir: str = DOCS_DIR) -> list[tuple[dict, dict]]:
+    """``(json, metadata)`` for the docs_kb records generate_procedures_md.py renders, in the same order."""
+    records = []
+    for fname in list_json_files(docs_dir):
+        doc = load_json(os.path.join(docs_dir, fname))
+        procedure = doc.get("json")
+        if not procedure or not isinstance(procedure, dict):
+            continue
+        records.append((procedure, doc.get("metadata", {})))
+    return records
+
+
+def load_procedure_documents(docs_dir: str = DOCS_DIR) -> list[dict]:
+    return [procedure_document(p, m) for p, m in load_procedure_records(docs_dir)]
+
+
+class LocalSearchIndex:
+    """In-memory hybrid search: BM25 over an inverted index fused with dense cosine scores via RRF.
+
+    Dense scoring is only used once ``embed()`` has loaded document embeddings
+    and the caller passes a query embedding; otherwise it is BM25 alone.
+    """
+
+    def __init__(self, documents: list[dict], k1: float = 1.5, b: float = 0.75, rrf_k: int = 60):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.rrf_k = rrf_k
+        self.embeddings: np.ndarray | None = None
+
+        doc_tokens = [tokenize(d["text"]) for d in documents]
+        self.doc_lengths = np.array([len(t) for t in doc_tokens], dtype=np.float32)
+        avg_length = float(self.doc_lengths.mean()) if len(documents) else 0.0
+        # Per-document BM25 length normalisation, precomputed once
+        self._length_norm = k1 * (1 - b + b * self.doc_lengths / (avg_length or 1.0))
+
+        postings = defaultdict(list)
+        for doc_id, tokens in enumerate(doc_tokens):
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc_id, tf))
+        n_docs = len(documents)
+        self._postings: dict[str, tuple[np.ndarray, np.ndarray, float]] = {}
+        for term, entries in postings.items():
+            ids = np.array([e[0] for e in entries], dtype=np.int32)
+            tfs = np.array([e[1] for e in entries], dtype=np.float32)
+            idf = math.log(1 + (n_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            self._postings[term] = (ids, tfs, idf)
+
+    @classmethod
+    def from_docs(cls, docs_dir: str = DOCS_DIR) -> "LocalSearchIndex":
+        return cls(load_procedure_documents(docs_dir))
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _fingerprint(self, model: str) -> str:
+        h = hashlib.sha256(model.encode("utf-8"))
+        for d in self.documents:
+            h.update(d["text"].encode("utf-8"))
+        return h.hexdigest()
+
+    async def embed(self, embedder, path: str = LOCAL_SEARCH_EMBEDDINGS):
+        """Load document embeddings from ``path`` or compute them in one batch and save them."""
+        model = str(getattr(getattr(embedder, "config", None), "embedding_model", type(embedder).__name__))
+        fingerprint = self._fingerprint(model)
+        if path and os.path.exists(path):
+            saved = np.load(path)
+            if str(saved["fingerprint"]) == fingerprint:
+                self._set_embeddings(saved["embeddings"])
+                logger.info(f"Loaded {len(self.documents)} local search embeddings from {path}")
+                return
+        vectors = await embedder.create_batch([d["text"] for d in self.documents])
+        self._set_embeddings(np.asarray(vectors, dtype=np.float32))
+        if path:
+            np.savez(path, embeddings=self.embeddings, fingerprint=np.array(fingerprint))
+        logger.info(f"Computed {len(self.documents)} local search embeddings")
+
+    def _set_embeddings(self, matrix: np.ndarray):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.embeddings = matrix / np.where(norms == 0, 1.0, norms)
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            ids, tfs, idf = posting
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[ids])
+        return scores
+
+    def dense_scores(self, query_embedding) -> np.ndarray:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        return self.embeddings @ (query / (np.linalg.norm(query) or 1.0))
+
+    def _rrf(self, scores: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        ranks = np.empty(len(scores), dtype=np.float32)
+        ranks[np.argsort(-scores, kind="stable")] = np.arange(1, len(scores) + 1)
+        return np.where(mask, 1.0 / (self.rrf_k + ranks), 0.0)
+
+    def search(self, query: str, query_embedding=None, limit: int = 5) -> list[dict]:
+        """Top ``limit`` records in the API's ``name``/``group_id``/``summary`` shape."""
+        if not self.documents:
+            return []
+        bm25 = self.bm25_scores(query)
+        fused = self._rrf(bm25, bm25 > 0)
+        if query_embedding is not None and self.embeddings is not None:
+            dense = self.dense_scores(query_embedding)
+            fused = fused + self._rrf(dense, np.ones(len(dense), dtype=bool))
+        if not fused.any():
+            return []
+        limit = min(limit, len(fused))
+        top = np.argpartition(-fused, limit - 1)[:limit]
+        top = top[np.argsort(-fused[top], kind="stable")]
+        return [
+            {
+                "name": self.documents[i]["name"],
+                "group_id": self.documents[i]["group_id"],
+                "summary": self.documents[i]["summary"],
+            }
+            for i in top
+            if fused[i] > 0
+        ]
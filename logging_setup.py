@@ -0,0 +1,108 @@
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+from pythonjsonlogger.json import JsonFormatter
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# "json" for structured records, "text" for the classic human-readable format
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+# Fraction of requests whose full payload and results are logged
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', '0.01'))
+LOG_MAX_FIELD_CHARS = int(os.environ.get('LOG_MAX_FIELD_CHARS', '500'))
+LOG_MAX_LIST_ITEMS = int(os.environ.get('LOG_MAX_LIST_ITEMS', '10'))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+
+# Keys whose values never reach the logs (caller details, credentials)
+REDACTED_KEYS = {
+    "authorization", "apikey", "api_key", "token", "secret", "password",
+    "customer", "phonenumber", "number", "email",
+}
+
+_payload_sampled = contextvars.ContextVar("payload_sampled", default=False)
+_listener = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread and drops records when the queue is full."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Only resolve %-style args here; JSON rendering and I/O happen on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Route all logging through a bounded queue to a background listener writing to stdout."""
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter(
+            "%(asctime)s %(name)s %(levelname)s %(message)s",
+            rename_fields={"asctime": "timestamp", "levelname": "level", "name": "logger"},
+        ))
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    root.handlers = [DroppingQueueHandler(log_queue)]
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def sample_payload() -> bool:
+    """Decide once per request whether its full payload/results are logged; child tasks inherit it."""
+    sampled = LOG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < LOG_PAYLOAD_SAMPLE_RATE
+    _payload_sampled.set(sampled)
+    return sampled
+
+
+def payload_sampled() -> bool:
+    return _payload_sampled.get()
+
+
+def redact(value, max_chars: int = LOG_MAX_FIELD_CHARS, max_items: int = LOG_MAX_LIST_ITEMS):
+    """Copy of ``value`` with sensitive keys redacted, long strings truncated and long lists cut."""
+    if isinstance(value, dict):
+        return {
+            k: "[REDACTED]" if str(k).lower() in REDACTED_KEYS else redact(v, max_chars, max_items)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        items = [redact(v, max_chars, max_items) for v in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"... {len(value) - max_items} more")
+        return items
+    if isinstance(value, str) and len(value) > max_chars:
+        return f"{value[:max_chars]}... [{len(value) - max_chars} chars truncated]"
+    return value
@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import orjson
+
+EXCLUDE_FILES = {"all_links.json", ".DS_Store"}
+MD_BUILD_WORKERS = int(os.environ.get("MD_BUILD_WORKERS", "0")) or None  # None = one per CPU
+# "markdown" writes the combined .md, "chunks" the JSONL chunk file, "both" writes both
+MD_OUTPUT_MODE = os.environ.get("MD_OUTPUT_MODE", "markdown")
+
+
+def list_json_files(docs_dir, exclude=EXCLUDE_FILES):
+    files = [
+        f for f in os.listdir(docs_dir)
+        if f.endswith(".json") and f not in exclude
+    ]
+    # Numbered files first in numeric order, then URL-named files alphabetically
+    files.sort(key=lambda x: (0, int(x.split(".")[0]), "") if x.split(".")[0].isdigit() else (1, 0, x))
+    return files
+
+
+def load_json(filepath):
+    with open(filepath, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def _render_file(job):
+    render, filepath = job
+    return render(load_json(filepath))
+
+
+def build(docs_dir, render, header_lines, output_file=None, chunks_file=None, workers=MD_BUILD_WORKERS):
+    """Render every JSON file in ``docs_dir`` in a process pool and stream the results to disk.
+
+    ``render(doc)`` must be a module-level function returning ``(markdown, metadata)``
+    or ``None`` to skip the file. Sections are written in file order as soon as
+    they (and everything before them) are ready. ``output_file`` receives the
+    combined markdown; ``chunks_file`` receives one JSON line per section with
+    its metadata. Returns the number of sections written.
+    """
+    files = list_json_files(docs_dir)
+    jobs = [(render, os.path.join(docs_dir, fname)) for fname in files]
+    workers = workers or os.cpu_count() or 1
+    corpus = os.path.basename(os.path.normpath(docs_dir))
+    md_out = open(output_file, "w", encoding="utf-8") if output_file else None
+    chunks_out = open(chunks_file, "wb") if chunks_file else None
+    count = 0
+    try:
+        if md_out:
+            md_out.write("\n".join(header_lines))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(jobs) // (4 * workers))
+            # map() yields in submission order, so output is stable regardless of completion order
+            for fname, rendered in zip(files, pool.map(_render_file, jobs, chunksize=chunksize)):
+                if rendered is None:
+                    continue
+                section, metadata = rendered
+                if md_out:
+                    md_out.write("\n" + section)
+                if chunks_out:
+                    chunk = {"id": f"{corpus}/{fname}", "source_file": fname, **metadata, "text": section}
+                    chunks_out.write(orjson.dumps(chunk) + b"\n")
+                count += 1
+    finally:
+        if md_out:
+            md_out.close()
+        if chunks_out:
+            chunks_out.close()
+    return count
+
+
+def output_paths(output_file, chunks_file, mode=MD_OUTPUT_MODE):
+    """Which of the markdown / chunk outputs ``mode`` asks for."""
+    if mode not in ("markdown", "chunks", "both"):
+        raise ValueError(f"MD_OUTPUT_MODE must be 'markdown', 'chunks' or 'both', not '{mode}'")
+    return (
+        output_file if mode in ("markdown", "both") else None,
+        chunks_file if mode in ("chunks", "both") else None,
+    )
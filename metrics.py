@@ -0,0 +1,161 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Set (by serve.py) when several worker processes serve the app; /metrics then aggregates them
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+# Buckets tuned for voice-agent tool calls: sub-millisecond cache hits up to multi-second graph searches
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0,
+)
+
+STAGE_LATENCY = Histogram(
+    "search_api_stage_seconds",
+    "Time spent per request stage.",
+    ["endpoint", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    "search_api_in_flight_requests",
+    "Requests currently being handled.",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+ERRORS = Counter(
+    "search_api_errors_total",
+    "Failed requests or tool calls by failure type.",
+    ["endpoint", "error_type"],
+)
+RESULT_COUNT = Histogram(
+    "search_api_result_count",
+    "Results returned per search.",
+    ["endpoint"],
+    buckets=(0, 1, 2, 3, 4, 5, 10, 20),
+)
+TIER_ANSWERS = Counter(
+    "search_api_tier_answers_total",
+    "Searches answered per tier (search recipe, stale_cache, fast or keyword).",
+    ["endpoint", "tier"],
+)
+COALESCED = Counter(
+    "search_api_coalesced_total",
+    "Searches that joined an identical search already in flight.",
+    ["endpoint"],
+)
+EMBEDDING_CACHE = Counter(
+    "search_api_embedding_cache_total",
+    "Embedding lookups by outcome (memory, disk or miss).",
+    ["tier"],
+)
+EMBEDDING_CACHE_SAVED = Counter(
+    "search_api_embedding_cache_saved_seconds_total",
+    "Estimated embedding API time avoided by cache hits.",
+)
+
+_endpoint = contextvars.ContextVar("metrics_endpoint", default="other")
+_embed_seconds = contextvars.ContextVar("metrics_embed_seconds", default=None)
+
+
+@contextmanager
+def track_request(endpoint: str):
+    """Label everything timed inside with ``endpoint``, count it in flight and time the whole request."""
+    token = _endpoint.set(endpoint)
+    gauge = IN_FLIGHT.labels(endpoint)
+    gauge.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(endpoint, "total").observe(time.perf_counter() - start)
+        gauge.dec()
+        _endpoint.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """Observe the duration of one stage (parse, embed, graph_search, serialize, ...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(_endpoint.get(), name).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def graph_search_stage():
+    """Time a ``graphiti._search`` call and split out its Neo4j share.
+
+    Query embedding happens inside the search; ``TimedEmbedder`` adds its time
+    to a per-call accumulator so ``neo4j`` = ``graph_search`` - embedding time.
+    """
+    embed_seconds = [0.0]
+    token = _embed_seconds.set(embed_seconds)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        endpoint = _endpoint.get()
+        STAGE_LATENCY.labels(endpoint, "graph_search").observe(elapsed)
+        STAGE_LATENCY.labels(endpoint, "neo4j").observe(max(0.0, elapsed - embed_seconds[0]))
+        _embed_seconds.reset(token)
+
+
+def record_error(error_type: str):
+    ERRORS.labels(_endpoint.get(), error_type).inc()
+
+
+def record_tier(tier: str):
+    TIER_ANSWERS.labels(_endpoint.get(), tier).inc()
+
+
+def record_coalesced():
+    COALESCED.labels(_endpoint.get()).inc()
+
+
+def record_results(count: int):
+    RESULT_COUNT.labels(_endpoint.get()).observe(count)
+
+
+class TimedEmbedder:
+    """Embedder wrapper that reports every call as the ``embed`` stage.
+
+    Duck-typed rather than subclassing ``EmbedderClient`` so importing this
+    module does not pull in graphiti_core.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.config = getattr(inner, "config", None)
+
+    def _observe(self, elapsed: float):
+        STAGE_LATENCY.labels(_endpoint.get(), "embed").observe(elapsed)
+        embed_seconds = _embed_seconds.get()
+        if embed_seconds is not None:
+            embed_seconds[0] += elapsed
+
+    async def create(self, input_data):
+        start = time.perf_counter()
+        try:
+            return await self.inner.create(input_data)
+        finally:
+            self._observe(time.perf_counter() - start)
+
+    async def create_batch(self, input_data_list):
+        start = time.perf_counter()
+        try:
+            return await self.inner.create_batch(input_data_list)
+        finally:
+            self._observe(time.perf_counter() - start)
+
+
+def instrument_graphiti(graphiti):
+    """Swap in a ``TimedEmbedder`` on a Graphiti instance (its search reads ``clients.embedder``)."""
+    timed = TimedEmbedder(graphiti.embedder)
+    graphiti.embedder = timed
+    graphiti.clients.embedder = timed
+    return graphiti
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from search_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.environ.get('PREFETCH_ENABLED', '1') != '0'
+# How long a call's prefetched context stays usable after its last activity
+PREFETCH_TTL_SECONDS = float(os.environ.get('PREFETCH_TTL_SECONDS', '900'))
+PREFETCH_MAX_CALLS = int(os.environ.get('PREFETCH_MAX_CALLS', '1000'))
+PREFETCH_MAX_EDGES = int(os.environ.get('PREFETCH_MAX_EDGES', '25'))
+PREFETCH_MAX_CONCURRENCY = int(os.environ.get('PREFETCH_MAX_CONCURRENCY', '4'))
+
+# Procedures with their current neighbours (body areas, payment methods, referring doctors)
+NEIGHBOURS_QUERY = """
+MATCH (n:Entity)
+WHERE n.group_id IN $group_ids AND n.name IN $names
+OPTIONAL MATCH (n)-[e:RELATES_TO]-(m:Entity)
+WHERE e.expired_at IS NULL AND e.invalid_at IS NULL
+WITH n, e, m ORDER BY e.created_at DESC
+WITH n, collect(CASE WHEN e IS NULL THEN NULL
+                     ELSE {relation: e.name, fact: e.fact, name: m.name, summary: m.summary} END) AS edges
+RETURN n.name AS name, n.group_id AS group_id, n.summary AS summary,
+       n {.procedure_type, .cost_raw, .recovery_time, .results_duration} AS attributes,
+       edges[..$max_edges] AS edges
+"""
+
+# Follow-up intents: trigger words and the edge types that answer them
+INTENTS = {
+    "cost": (
+        {"cost", "costs", "price", "prices", "much", "pay", "paying", "payment", "payments", "afterpay",
+         "finance", "afford", "card", "cards", "cash", "visa", "mastercard", "expensive", "cheap"},
+        {"ACCEPTS_PAYMENT"},
+    ),
+    "recovery": (
+        {"recovery", "recover", "downtime", "heal", "healing", "long", "last", "lasts", "results"},
+        set(),
+    ),
+    "area": ({"area", "areas", "where", "body", "treat", "treats", "target", "targets"}, {"TREATS_AREA"}),
+    "referral": ({"referral", "refer", "gp", "doctor", "doctors", "surgeon"}, {"REQUIRES_REFERRAL"}),
+}
+_INTENT_WORDS = set().union(*(words for words, _ in INTENTS.values()))
+# Words that can make up a follow-up question without naming anything new ("how long is the recovery for it?")
+_FILLER_WORDS = {
+    "a", "an", "the", "it", "its", "s", "that", "this", "those", "these", "they", "them", "one",
+    "is", "are", "was", "be", "do", "does", "did", "can", "could", "will", "would", "should", "i", "you", "we",
+    "my", "me", "your", "for", "of", "to", "on", "in", "with", "and", "or", "how", "what", "whats", "when",
+    "which", "who", "there", "any", "much", "many", "take", "takes", "need", "get", "have", "has", "about",
+    "procedure", "treatment", "option", "options", "so", "also", "then", "ok", "okay", "by", "use",
+}
+
+
+async def fetch_neighbours(driver, names: list[str], group_ids: list[str],
+                           max_edges: int = PREFETCH_MAX_EDGES) -> dict[str, dict]:
+    """Procedure nodes named ``names`` with their live neighbouring edges and nodes, keyed by name."""
+    records, _, _ = await driver.execute_query(
+        NEIGHBOURS_QUERY, names=names, group_ids=group_ids, max_edges=max_edges, routing_="r"
+    )
+    return {
+        record["name"]: {
+            "name": record["name"],
+            "group_id": record["group_id"],
+            "summary": record["summary"],
+            "attributes": {k: v for k, v in (record["attributes"] or {}).items() if v},
+            "edges": record["edges"],
+        }
+        for record in records
+    }
+
+
+ATTRIBUTE_LABELS = {
+    "procedure_type": "Procedure type",
+    "cost_raw": "Cost",
+    "recovery_time": "Recovery time",
+    "results_duration": "Results duration",
+}
+
+
+def _with_attributes(summary: str | None, attributes: dict) -> str:
+    parts = [summary] if summary else []
+    parts.extend(f"{label}: {attributes[key]}." for key, label in ATTRIBUTE_LABELS.items() if attributes.get(key))
+    return " ".join(parts)
+
+
+def _tokens(text: str) -> list[str]:
+    return normalize_query(text).split()
+
+
+def _contains(query_tokens: list[str], name_tokens: list[str]) -> bool:
+    n = len(name_tokens)
+    return n > 0 and any(query_tokens[i:i + n] == name_tokens for i in range(len(query_tokens) - n + 1))
+
+
+class CallContext:
+    __slots__ = ("procedures", "expires_at", "latest")
+
+    def __init__(self, expires_at: float):
+        self.procedures: dict[str, dict] = {}
+        self.expires_at = expires_at
+        self.latest: str | None = None
+
+
+class Prefetcher:
+    """Per-call cache of procedures' neighbouring context, loaded in the background after a search.
+
+    ``schedule(call_id, results)`` starts loading the neighbours of the
+    procedure nodes a search returned; ``is_procedure(name)``, when given,
+    picks those out so other nodes cost no Neo4j reads. ``answer(call_id, query)`` serves a
+    follow-up in the same call from that cache when it names a prefetched
+    procedure or neighbour, or is a bare follow-up ("how long is the recovery?")
+    about the procedure discussed last.
+    """
+
+    def __init__(self, fetch, ttl_seconds: float = PREFETCH_TTL_SECONDS, max_calls: int = PREFETCH_MAX_CALLS,
+                 max_concurrency: int = PREFETCH_MAX_CONCURRENCY, enrich=None, is_procedure=None):
+        self.fetch = fetch
+        self.enrich = enrich
+        self.is_procedure = is_procedure
+        self.ttl_seconds = ttl_seconds
+        self.max_calls = max_calls
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._calls: OrderedDict[str, CallContext] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+        self.prefetched = 0
+        self.failures = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _context(self, call_id: str, create: bool = False) -> CallContext | None:
+        now = time.monotonic()
+        context = self._calls.get(call_id)
+        if context is not None and context.expires_at <= now:
+            del self._calls[call_id]
+            context = None
+        if context is None and create:
+            context = self._calls[call_id] = CallContext(now + self.ttl_seconds)
+            while len(self._calls) > self.max_calls:
+                self._calls.popitem(last=False)
+        if context is not None:
+            context.expires_at = now + self.ttl_seconds
+            self._calls.move_to_end(call_id)
+        return context
+
+    def schedule(self, call_id: str | None, results: list[dict]):
+        """Load neighbours of the procedures in ``results`` for ``call_id`` in the background."""
+        if not call_id or not results:
+            return
+        procedures = [
+            r for r in results
+            if r.get("name") and (self.is_procedure is None or self.is_procedure(r["name"]))
+        ]
+        if not procedures:
+            return
+        context = self._context(call_id, create=True)
+        context.latest = procedures[0]["name"]
+        names = [r["name"] for r in procedures if r["name"] not in context.procedures]
+        if not names:
+            return
+        group_ids = sorted({r["group_id"] for r in procedures if r.get("group_id")})
+        task = asyncio.create_task(self._load(call_id, names, group_ids))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _load(self, call_id: str, names: list[str], group_ids: list[str]):
+        try:
+            async with self._semaphore:
+                found = await self.fetch(names, group_ids)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Prefetch failed for call {call_id}: {e}")
+            return
+        context = self._context(call_id)
+        if context is None:
+            return
+        for name, procedure in found.items():
+            if self.enrich:
+                procedure["attributes"] = {**self.enrich(name), **procedure["attributes"]}
+            context.procedures[name] = procedure
+        self.prefetched += len(found)
+
+    def answer(self, call_id: str | None, query: str, limit: int = 5) -> list[dict] | None:
+        """Results for a follow-up ``query`` from the call's prefetched context, or ``None`` on a miss."""
+        context = self._context(call_id) if call_id else None
+        if context is None or not context.procedures:
+            return None
+        tokens = _tokens(query)
+        matched = [p for p in context.procedures.values() if _contains(tokens, _tokens(p["name"]))]
+        if not matched:
+            # A neighbour named in the question ("do you take AfterPay for that?") points at its procedure,
+            # but only when exactly one prefetched procedure has it and nothing else is named
+            matched = [
+                p for p in context.procedures.values()
+                if any(e.get("name") and _contains(tokens, _tokens(e["name"])) for e in p["edges"])
+            ]
+            if matched:
+                named = {
+                    t for p in matched for e in p["edges"]
+                    if e.get("name") and _contains(tokens, _tokens(e["name"])) for t in _tokens(e["name"])
+                }
+                # Other words may name a procedure that wasn't prefetched ("does Botox take Visa?")
+                leftover = [t for t in tokens if t not in named and t not in _FILLER_WORDS and t not in _INTENT_WORDS]
+                if len(matched) > 1 or leftover:
+                    self.misses += 1
+                    return None
+        if not matched and context.latest in context.procedures:
+            leftover = [t for t in tokens if t not in _FILLER_WORDS and t not in _INTENT_WORDS]
+            if not leftover and any(t in _INTENT_WORDS for t in tokens):
+                matched = [context.procedures[context.latest]]
+        if not matched:
+            self.misses += 1
+            return None
+        self.hits += 1
+        context.latest = matched[0]["name"]
+        return self._results(matched, tokens, limit)
+
+    @staticmethod
+    def _results(procedures: list[dict], tokens: list[str], limit: int) -> list[dict]:
+        relations = set().union(*(rels for words, rels in INTENTS.values() if words.intersection(tokens)))
+        token_set = set(tokens)
+        # Same name/group_id/summary shape as every other search tier; attributes and facts go into the summary
+        results = [
+            {"name": p["name"], "group_id": p["group_id"], "summary": _with_attributes(p["summary"], p["attributes"])}
+            for p in procedures
+        ]
+
+        def relevance(edge):
+            words = set(_tokens(f"{edge.get('fact') or ''} {edge.get('name') or ''}"))
+            return (edge.get("relation") in relations, len(words & token_set))
+
+        for p in procedures:
+            for edge in sorted(p["edges"], key=relevance, reverse=True):
+                if len(results) >= limit:
+                    return results
+                results.append({
+                    "name": edge.get("name"),
+                    "group_id": p["group_id"],
+                    "summary": " ".join(text for text in (edge.get("fact"), edge.get("summary")) if text),
+                })
+        return results[:limit]
+
+    async def close(self):
+        """Cancel in-flight prefetches and wait for them to finish, e.g. before the driver closes."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "calls": len(self._calls),
+            "in_flight": len(self._tasks),
+            "prefetched": self.prefetched,
+            "failures": self.failures,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRateLimiter:
+    """Token bucket shared by concurrent workers.
+
+    ``rate`` tokens are added per second up to ``burst``; ``acquire()`` waits
+    until a token is available. A rate of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def retry_with_backoff(
+    func,
+    *args,
+    retry_on: tuple[type[BaseException], ...] = (Exception,),
+    max_attempts: int = 4,
+    base_delay: float = 2.0,
+    max_delay: float = 60.0,
+    description: str = "call",
+    **kwargs,
+):
+    """Await ``func(*args, **kwargs)``, retrying ``retry_on`` errors with jittered exponential backoff."""
+    attempt = 1
+    while True:
+        try:
+            return await func(*args, **kwargs)
+        except retry_on as e:
+            if attempt >= max_attempts:
+                raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            logger.warning(f"[RETRY] {description} failed (attempt {attempt}/{max_attempts}): {e}; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
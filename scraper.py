@@ -1,11 +1,34 @@
+import asyncio
+import hashlib
 import os
+import re
 import types
+from urllib.parse import urlparse
+
+import requests
 from firecrawl import FirecrawlApp, JsonConfig
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 import json
 
-# Initialize the FirecrawlApp with your API key
-app = FirecrawlApp(api_key=os.getenv('FIRECRAWL_API_KEY'))
+from ingestion_manifest import INGEST_MANIFEST, IngestionManifest
+from rate_limit import AsyncRateLimiter, retry_with_backoff
+
+CRAWL_URL = os.environ.get('CRAWL_URL', "https://www.absolutecosmetic.com.au/procedures/")
+OUTPUT_DIR = os.environ.get('SCRAPE_OUTPUT_DIR', "docs_kb")
+SCRAPE_WORKERS = int(os.environ.get('SCRAPE_WORKERS', '5'))
+# Firecrawl requests started per second across all workers
+SCRAPE_RATE_PER_SEC = float(os.environ.get('SCRAPE_RATE_PER_SEC', '2'))
+SCRAPE_MAX_ATTEMPTS = int(os.environ.get('SCRAPE_MAX_ATTEMPTS', '3'))
+# Firecrawl statuses worth retrying; other 4xx (bad URL, payment, auth) fail the URL straight away
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+# Files written by the original sequential scraper: docs_kb/<n>.json
+_NUMBERED_FILE = re.compile(r"^\d+\.json$")
+
+
+class TransientScrapeError(Exception):
+    """A Firecrawl failure that may succeed on retry (timeout, rate limit, 5xx)."""
+
+TRANSIENT_ERRORS = (TransientScrapeError, requests.ConnectionError, requests.Timeout)
 
 class ExtractSchema(BaseModel):
     procedure_name: str
@@ -36,24 +59,70 @@ def make_json_safe(obj):
     else:
         return str(obj)  # fallback: convert to string
 
-crawl_url = "https://www.absolutecosmetic.com.au/procedures/"
-map_result = app.map_url(crawl_url)
+def output_filename(url: str) -> str:
+    """Stable file name for a URL: a readable path slug plus a short hash of the full URL."""
+    parsed = urlparse(url)
+    slug = re.sub(r"[^a-z0-9]+", "-", parsed.path.lower()).strip("-") or "index"
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:8]
+    return f"{slug[:80]}-{digest}.json"
+
+def source_url(record: dict) -> str | None:
+    """URL a saved scrape came from; ``sourceURL`` is the one ``map_url`` returned."""
+    metadata = record.get("metadata") or {}
+    return metadata.get("sourceURL") or metadata.get("url") or metadata.get("og:url") or metadata.get("ogUrl")
 
-# Save all links to a file for inspection
-all_links_path = os.path("all_links.json")
-with open(all_links_path, "w") as f:
-    json.dump(map_result.links, f, indent=2)
-print(f"Saved {len(map_result.links)} links to {all_links_path}")
+def migrate_numbered_files(output_dir, manifest_path=INGEST_MANIFEST):
+    """Rename ``<n>.json`` files from the old scraper to their URL-based names.
 
-output_dir = "docs_kb"
-os.makedirs(output_dir, exist_ok=True)
+    Without this, the first re-scrape writes every record again under its new
+    name. A numbered file whose URL already has a new-style file is removed.
+    The ingestion manifest entry moves with the file, so its episodes are kept
+    rather than re-ingested. Returns ``(renamed, removed)`` counts.
+    """
+    numbered = sorted(f for f in os.listdir(output_dir) if _NUMBERED_FILE.match(f)) if os.path.isdir(output_dir) else []
+    if not numbered:
+        return 0, 0
+    manifest = IngestionManifest(manifest_path) if os.path.exists(manifest_path) else None
+    renamed = removed = 0
+    for fname in numbered:
+        old_path = os.path.join(output_dir, fname)
+        try:
+            with open(old_path, "r") as f:
+                url = source_url(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Could not read {old_path} for migration: {e}")
+            continue
+        if not url:
+            print(f"Leaving {old_path}: no source URL in its metadata")
+            continue
+        new_name = output_filename(url)
+        new_path = os.path.join(output_dir, new_name)
+        if os.path.exists(new_path):
+            os.remove(old_path)
+            removed += 1
+        else:
+            os.replace(old_path, new_path)
+            renamed += 1
+            if manifest is not None:
+                manifest.rename(fname, new_name, save=False)
+    if manifest is not None:
+        manifest.save()
+    if renamed or removed:
+        print(f"Migrated numbered files in {output_dir}: {renamed} renamed, {removed} duplicates removed")
+    return renamed, removed
 
-for i, url in enumerate(map_result.links):
-    llm_extraction_result = app.scrape_url(
-        url,
-        formats=["json"],
-        json_options=json_config
-    )
+def scrape_one(client, url):
+    try:
+        llm_extraction_result = client.scrape_url(
+            url,
+            formats=["json"],
+            json_options=json_config
+        )
+    except requests.HTTPError as e:
+        status = getattr(e.response, "status_code", None)
+        if status in TRANSIENT_STATUSES:
+            raise TransientScrapeError(str(e)) from e
+        raise
     # Use model_dump if available, else to_dict, else as-is
     if hasattr(llm_extraction_result, "model_dump"):
         serializable_result = llm_extraction_result.model_dump()
@@ -61,10 +130,75 @@ for i, url in enumerate(map_result.links):
         serializable_result = llm_extraction_result.to_dict()
     else:
         serializable_result = llm_extraction_result
-    serializable_result = make_json_safe(serializable_result)
-    print(json.dumps(serializable_result, indent=2))
-    file_path = os.path.join(output_dir, f"{i+63}.json")
-    with open(file_path, "w") as f:
-        json.dump(serializable_result, f, indent=2)
-    print(f"Saved: {file_path}")
+    return make_json_safe(serializable_result)
+
+async def scrape_all(client, urls, output_dir, workers=SCRAPE_WORKERS, rate=SCRAPE_RATE_PER_SEC,
+                     max_attempts=SCRAPE_MAX_ATTEMPTS):
+    """Scrape ``urls`` into ``output_dir`` with a pool of workers.
+
+    URLs whose output file already exists are skipped, so an interrupted crawl
+    can simply be restarted. Files from the old numbered layout are migrated
+    first. Only ``TRANSIENT_ERRORS`` are retried. ``client`` only needs a
+    FirecrawlApp-style ``scrape_url``; the blocking call runs in a thread per
+    worker.
+    Returns ``(saved, skipped, failed)`` counts.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    migrate_numbered_files(output_dir)
+    limiter = AsyncRateLimiter(rate)
+    queue = asyncio.Queue()
+    for url in dict.fromkeys(urls):
+        queue.put_nowait(url)
+    counts = {"saved": 0, "skipped": 0, "failed": 0}
+
+    async def worker():
+        while True:
+            try:
+                url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            file_path = os.path.join(output_dir, output_filename(url))
+            if os.path.exists(file_path):
+                counts["skipped"] += 1
+                continue
+
+            async def fetch():
+                await limiter.acquire()
+                return await asyncio.to_thread(scrape_one, client, url)
+
+            try:
+                serializable_result = await retry_with_backoff(
+                    fetch, retry_on=TRANSIENT_ERRORS, max_attempts=max_attempts, description=f"scrape_url({url})"
+                )
+            except Exception as e:
+                print(f"Failed: {url}: {e}")
+                counts["failed"] += 1
+                continue
+            tmp_path = f"{file_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(serializable_result, f, indent=2)
+            os.replace(tmp_path, file_path)
+            counts["saved"] += 1
+            print(f"Saved: {file_path}")
+
+    await asyncio.gather(*[worker() for _ in range(max(1, workers))])
+    return counts["saved"], counts["skipped"], counts["failed"]
+
+def main(client=None, crawl_url=CRAWL_URL, output_dir=OUTPUT_DIR):
+    if client is None:
+        # Initialize the FirecrawlApp with your API key
+        client = FirecrawlApp(api_key=os.getenv('FIRECRAWL_API_KEY'))
+    map_result = client.map_url(crawl_url)
+
+    os.makedirs(output_dir, exist_ok=True)
+    # Save all links to a file for inspection
+    all_links_path = os.path.join(output_dir, "all_links.json")
+    with open(all_links_path, "w") as f:
+        json.dump(map_result.links, f, indent=2)
+    print(f"Saved {len(map_result.links)} links to {all_links_path}")
+
+    saved, skipped, failed = asyncio.run(scrape_all(client, map_result.links, output_dir))
+    print(f"Scrape complete. Saved: {saved}, Skipped (already scraped): {skipped}, Failed: {failed}")
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import urllib.request
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', '1024'))
+SEARCH_CACHE_TTL_SECONDS = float(os.environ.get('SEARCH_CACHE_TTL_SECONDS', '600'))
+# Cosine distance under which a differently-worded query reuses a cached answer.
+# Set to 0 to disable near-duplicate matching (and the extra embedding call).
+SEARCH_CACHE_MAX_DISTANCE = float(os.environ.get('SEARCH_CACHE_MAX_DISTANCE', '0.08'))
+# Directory of the cross-process hot-answer cache; unset keeps every cache per process
+SEARCH_SHARED_CACHE_DIR = os.environ.get('SEARCH_SHARED_CACHE_DIR', '')
+
+_PUNCTUATION = re.compile(r"[^\w\s$]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivial variants share a key."""
+    query = _PUNCTUATION.sub(" ", query.lower())
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+def config_fingerprint(config) -> str:
+    """Stable short hash of a Graphiti SearchConfig (or anything JSON-serialisable)."""
+    if hasattr(config, "model_dump_json"):
+        raw = config.model_dump_json()
+    else:
+        raw = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class CacheEntry:
+    __slots__ = ("results", "slot", "expires_at")
+
+    def __init__(self, results, slot, expires_at):
+        self.results = results
+        # Row of the cache's embedding matrix, or None when stored without an embedding
+        self.slot = slot
+        self.expires_at = expires_at
+
+
+class SearchCache:
+    """Bounded LRU + TTL cache of search results with optional near-duplicate lookup.
+
+    Keys are ``(normalized query, sorted group_ids, config fingerprint)``. When an
+    embedding is supplied, a query that misses on the exact key can still hit an
+    entry with the same group_ids/config whose embedding is within
+    ``max_distance`` cosine distance. Embeddings live, unit-normalised, in one
+    matrix of ``max_entries`` rows allocated on first use, so a lookup is a
+    single matrix-vector product with no per-lookup stacking.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = SEARCH_CACHE_TTL_SECONDS,
+        max_distance: float = SEARCH_CACHE_MAX_DISTANCE,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._entries: OrderedDict[tuple, CacheEntry] = OrderedDict()
+        self._matrix: np.ndarray | None = None
+        # Per row: owning key's (group_ids, config) scope id, or -1 when free
+        self._row_scope = np.full(max_entries, -1, dtype=np.int64)
+        self._row_keys: list[tuple | None] = [None] * max_entries
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self._scopes: dict[tuple, int] = {}
+        # Most recent results per (query, group_ids) from any config, kept past their TTL
+        self._last: OrderedDict[tuple, list] = OrderedDict()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query: str, group_ids: list[str] | None, config, fingerprint: str | None = None) -> tuple:
+        """``fingerprint`` skips re-serialising ``config`` when the caller already has its fingerprint."""
+        return (
+            normalize_query(query),
+            tuple(sorted(group_ids or [])),
+            fingerprint or config_fingerprint(config),
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key: tuple):
+        entry = self._entries.pop(key)
+        if entry.slot is not None:
+            self._row_scope[entry.slot] = -1
+            self._row_keys[entry.slot] = None
+            self._free_rows.append(entry.slot)
+
+    def _store_embedding(self, key: tuple, embedding) -> int | None:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+        if len(vector) != self._matrix.shape[1] or not self._free_rows:
+            return None
+        slot = self._free_rows.pop()
+        norm = np.linalg.norm(vector)
+        self._matrix[slot] = vector / norm if norm else vector
+        self._row_scope[slot] = self._scopes.setdefault(key[1:], len(self._scopes))
+        self._row_keys[slot] = key
+        return slot
+
+    def get(self, key: tuple):
+        """Exact-key lookup. Returns the cached results or None."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.results
+            self._drop(key)
+        return None
+
+    def get_similar(self, key: tuple, embedding):
+        """Nearest cached entry sharing group_ids/config, if within ``max_distance``."""
+        if embedding is None or self.max_distance <= 0 or self._matrix is None:
+            return None
+        scope = self._scopes.get(key[1:])
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        if scope is None or len(query) != self._matrix.shape[1]:
+            return None
+        similarity = self._matrix @ query / (np.linalg.norm(query) or 1.0)
+        similarity[self._row_scope != scope] = -np.inf
+        now = time.monotonic()
+        # Rows are few and mostly live, so expired winners are dropped and the next best tried
+        while True:
+            best = int(np.argmax(similarity))
+            if 1.0 - float(similarity[best]) > self.max_distance:
+                return None
+            best_key = self._row_keys[best]
+            best_entry = self._entries[best_key]
+            if best_entry.expires_at > now:
+                break
+            self._drop(best_key)
+            similarity[best] = -np.inf
+        self._entries.move_to_end(best_key)
+        self.semantic_hits += 1
+        return best_entry.results
+
+    def record_miss(self):
+        self.misses += 1
+
+    def set(self, key: tuple, results, embedding=None):
+        if key in self._entries:
+            self._drop(key)
+        while len(self._entries) >= self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+        slot = self._store_embedding(key, embedding) if embedding is not None else None
+        self._entries[key] = CacheEntry(results, slot, time.monotonic() + self.ttl_seconds)
+        self._last[key[:2]] = results
+        self._last.move_to_end(key[:2])
+        while len(self._last) > self.max_entries:
+            self._last.popitem(last=False)
+
+    def last_answer(self, key: tuple):
+        """Latest results stored for the key's query and group_ids under any config, even if expired.
+
+        The deadline fallback when no live search tier can answer in time.
+        """
+        return self._last.get(key[:2])
+
+    def invalidate(self, group_id: str | None = None) -> int:
+        """Drop every entry, or only those whose group_ids include ``group_id``."""
+        if group_id is None:
+            removed = len(self._entries)
+            for k in list(self._entries):
+                self._drop(k)
+            self._last.clear()
+        else:
+            stale = [k for k in self._entries if group_id in k[1]]
+            for k in stale:
+                self._drop(k)
+            for k in [k for k in self._last if group_id in k[1]]:
+                del self._last[k]
+            removed = len(stale)
+        logger.info(f"Invalidated {removed} search cache entries (group_id={group_id})")
+        return removed
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+
+class SharedSearchCache:
+    """Hot search answers shared by every worker process on the host, in a ``diskcache`` store.
+
+    diskcache is SQLite in WAL mode with memory-mapped reads, so a lookup from any
+    process is a page-cache read with no server to run. Entries expire after
+    ``ttl_seconds`` (there is no size-based eviction, which could drop the
+    generation counter and resurrect stale entries). Invalidation bumps a shared generation number that is part
+    of every key, orphaning all older entries at once; workers compare it with
+    the generation they last saw to know when to drop their in-process caches.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float = SEARCH_CACHE_TTL_SECONDS):
+        import diskcache
+        self.disk = diskcache.Cache(directory, eviction_policy="none")
+        self.ttl_seconds = ttl_seconds
+        self.seen_generation = self.generation()
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self) -> int:
+        return self.disk.get("generation", 0)
+
+    def changed(self) -> bool:
+        """True once per invalidation made by any process since the last call."""
+        current = self.generation()
+        if current == self.seen_generation:
+            return False
+        self.seen_generation = current
+        return True
+
+    def _key(self, key: tuple) -> str:
+        raw = json.dumps([self.seen_generation, *key], ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: tuple):
+        results = self.disk.get(self._key(key))
+        if results is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return results
+
+    def set(self, key: tuple, results):
+        self.disk.set(self._key(key), results, expire=self.ttl_seconds)
+
+    def invalidate(self) -> int:
+        """Orphan every entry for all processes; returns the new generation."""
+        generation = self.disk.incr("generation", default=0)
+        self.disk.expire()
+        return generation
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.disk),
+            "generation": self.seen_generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        self.disk.close()
+
+
+def invalidate_remote_cache(group_id: str):
+    """Ask a running search API (``SEARCH_API_URL``) to drop cached results for ``group_id``.
+
+    Called by the ingestion scripts after they rewrite a group, authenticated
+    with ``CACHE_ADMIN_TOKEN``. A no-op when ``SEARCH_API_URL`` is unset;
+    failures are logged, never raised.
+    """
+    base_url = os.environ.get("SEARCH_API_URL")
+    if not base_url:
+        return
+    body = json.dumps({"group_id": group_id}).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if os.environ.get("CACHE_ADMIN_TOKEN"):
+        headers["Authorization"] = f"Bearer {os.environ['CACHE_ADMIN_TOKEN']}"
+    req = urllib.request.Request(
+        f"{base_url.rstrip('/')}/cache/invalidate",
+        data=body,
+        headers=headers,
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            logger.info(f"Search cache invalidation for '{group_id}': {resp.read().decode()}")
+    except Exception as e:
+        logger.warning(f"Could not invalidate search cache at {base_url}: {e}")
@@ -0,0 +1,83 @@
+"""Serve app.py with several uvicorn worker processes on uvloop + httptools.
+
+Each worker runs ``startup_event`` itself, so it has its own Graphiti client and
+Neo4j driver and, with the default blocking warm start, only takes traffic once
+warm. The embedding cache and, when several workers run, the hot-answer cache
+(``SEARCH_SHARED_CACHE_DIR``) are shared on disk, so a new or restarted worker
+answers repeated questions from the others' work straight away.
+
+    python serve.py                 # WEB_CONCURRENCY workers (default: one per usable CPU, see available_cpus)
+    WEB_CONCURRENCY=1 python serve.py
+"""
+import logging
+import math
+import os
+import shutil
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+SERVE_HOST = os.environ.get('SERVE_HOST', '0.0.0.0')
+SERVE_PORT = int(os.environ.get('PORT', '8001'))
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: its affinity set, capped by a cgroup (container) CPU quota if there is one.
+
+    ``os.cpu_count()`` reports the host's cores, so a container limited to 2 CPUs
+    on a 64-core host would otherwise start 64 workers.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    quota = period = None
+    try:
+        # cgroup v2: "<quota> <period>", or "max <period>" when unlimited
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: a quota of -1 means unlimited
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f, open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as g:
+                quota, period = f.read().strip(), g.read().strip()
+        except OSError:
+            pass
+    if quota not in (None, 'max', '-1') and int(period) > 0:
+        cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    return max(1, cpus)
+
+
+SERVE_WORKERS = int(os.environ.get('WEB_CONCURRENCY') or available_cpus())
+SERVE_LOOP = os.environ.get('SERVE_LOOP', 'uvloop')
+SERVE_HTTP = os.environ.get('SERVE_HTTP', 'httptools')
+SERVE_METRICS_DIR = os.environ.get('SERVE_METRICS_DIR', '.prometheus_multiproc')
+
+
+def prepare_multiprocess(workers: int):
+    """Environment inherited by the worker processes; set before any of them import app.py."""
+    if workers <= 1:
+        return
+    os.environ.setdefault('SEARCH_SHARED_CACHE_DIR', '.search_cache')
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        # Samples of a previous run's processes must not leak into this one
+        shutil.rmtree(SERVE_METRICS_DIR, ignore_errors=True)
+        os.makedirs(SERVE_METRICS_DIR)
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = SERVE_METRICS_DIR
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    workers = max(1, SERVE_WORKERS)
+    prepare_multiprocess(workers)
+    logger.info(f"Serving app:app on {SERVE_HOST}:{SERVE_PORT} with {workers} worker(s) ({SERVE_LOOP}/{SERVE_HTTP})")
+    uvicorn.run(
+        "app:app",
+        host=SERVE_HOST,
+        port=SERVE_PORT,
+        workers=workers,
+        loop=SERVE_LOOP,
+        http=SERVE_HTTP,
+    )
+
+
+if __name__ == '__main__':
+    main()
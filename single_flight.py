@@ -0,0 +1,52 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one in-flight task.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task. Each caller awaits it through
+    ``asyncio.shield``, so a caller timing out or being cancelled never
+    cancels the shared work for the others.
+    """
+
+    def __init__(self):
+        self._inflight: dict = {}
+        self.started = 0
+        self.joined = 0
+
+    def __len__(self):
+        return len(self._inflight)
+
+    def _done(self, key, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, func, *args, **kwargs):
+        """Await ``func(*args, **kwargs)``, sharing the call with any in flight for ``key``.
+
+        Returns ``(result, joined)``, where ``joined`` is True when this caller
+        reused another caller's in-flight work.
+        """
+        task = self._inflight.get(key)
+        joined = task is not None
+        if joined:
+            self.joined += 1
+        else:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.started += 1
+        return await asyncio.shield(task), joined
+
+    def stats(self) -> dict:
+        calls = self.started + self.joined
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "joined": self.joined,
+            "coalesced_rate": round(self.joined / calls, 4) if calls else 0.0,
+        }
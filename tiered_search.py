@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Graphiti node search recipes, richest first; the executor drops down this list as the deadline nears.
+# Cross-encoder recipes add reranker LLM calls per search, so they are opt-in, e.g.
+# SEARCH_RECIPES=NODE_HYBRID_SEARCH_CROSS_ENCODER,NODE_HYBRID_SEARCH_RRF
+SEARCH_RECIPES = [
+    name.strip() for name in
+    os.environ.get('SEARCH_RECIPES', 'NODE_HYBRID_SEARCH_RRF').split(",")
+    if name.strip()
+]
+# Weight of the newest observation in each tier's latency estimate
+SEARCH_LATENCY_ALPHA = float(os.environ.get('SEARCH_LATENCY_ALPHA', '0.2'))
+
+
+class Tier(NamedTuple):
+    """One way of answering a search.
+
+    ``search()`` returns results, or ``None`` when the tier has no answer. ``instant``
+    tiers (cache lookups, in-memory keyword search) run even once the budget is
+    spent and are not timed out.
+    """
+    name: str
+    search: Callable[[], Awaitable]
+    instant: bool = False
+
+
+class LatencyEstimates:
+    """Exponentially weighted latency per tier, used to predict whether a tier fits the remaining budget.
+
+    A tier skipped for not fitting has its estimate decayed a little, so one
+    slow outlier doesn't lock it out for good.
+    """
+
+    def __init__(self, alpha: float = SEARCH_LATENCY_ALPHA, skip_decay: float = 0.9):
+        self.alpha = alpha
+        self.skip_decay = skip_decay
+        self._seconds: dict[str, float] = {}
+
+    def get(self, name: str) -> float:
+        return self._seconds.get(name, 0.0)
+
+    def observe(self, name: str, seconds: float):
+        previous = self._seconds.get(name)
+        self._seconds[name] = seconds if previous is None else (1 - self.alpha) * previous + self.alpha * seconds
+
+    def skipped(self, name: str):
+        if name in self._seconds:
+            self._seconds[name] *= self.skip_decay
+
+    def as_dict(self) -> dict:
+        return {name: round(seconds, 4) for name, seconds in self._seconds.items()}
+
+
+async def search_with_deadline(tiers: list[Tier], budget: float, estimates: LatencyEstimates):
+    """Answer from the richest tier that fits in ``budget`` seconds; returns ``(results, tier name)``.
+
+    A timed tier is skipped when its estimated latency doesn't fit in what is
+    left after reserving the next timed tier's estimate, and is cut off at that
+    point if it runs long. Errors also fall through to the next tier. Raises
+    the last error (or ``TimeoutError``) if no tier answers.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    last_error = None
+    for i, tier in enumerate(tiers):
+        if tier.instant:
+            results = await tier.search()
+            if results is not None:
+                return results, tier.name
+            continue
+        following = next((t for t in tiers[i + 1:] if not t.instant), None)
+        reserve = estimates.get(following.name) if following else 0.0
+        limit = deadline - loop.time() - reserve
+        if limit <= 0 or estimates.get(tier.name) > limit:
+            logger.info(f"Skipping search tier {tier.name}: {max(limit, 0):.3f}s left after reserve")
+            estimates.skipped(tier.name)
+            continue
+        start = loop.time()
+        try:
+            results = await asyncio.wait_for(tier.search(), timeout=limit)
+        except asyncio.TimeoutError as e:
+            # The real latency is at least the limit
+            estimates.observe(tier.name, loop.time() - start)
+            logger.warning(f"Search tier {tier.name} ran past its {limit:.3f}s slice, dropping down")
+            last_error = e
+            continue
+        except Exception as e:
+            logger.warning(f"Search tier {tier.name} failed, dropping down: {e}")
+            last_error = e
+            continue
+        estimates.observe(tier.name, loop.time() - start)
+        if results is not None:
+            return results, tier.name
+    if last_error is None or isinstance(last_error, asyncio.TimeoutError):
+        raise asyncio.TimeoutError(f"No search tier answered within {budget * 1000:.0f}ms")
+    raise last_error
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# "blocking" warms up before uvicorn accepts connections, "background" accepts connections
+# at once and reports /ready when warm-up finishes, "off" skips pool and query warm-up
+WARM_START_MODE = os.environ.get('WARM_START_MODE', 'blocking')
+# Bolt connections opened up front so the first callers don't pay for the handshake
+NEO4J_WARM_CONNECTIONS = int(os.environ.get('NEO4J_WARM_CONNECTIONS', '4'))
+# Searches run against the procedures group to warm the embedder client and Neo4j's indexes
+WARMUP_QUERIES = [
+    q.strip() for q in os.environ.get('WARMUP_QUERIES', 'botox,lip filler,recovery time').split(",") if q.strip()
+]
+WARMUP_TIMEOUT = float(os.environ.get('WARMUP_TIMEOUT', '30'))
+
+
+class StartupReport:
+    """Wall-clock breakdown of startup stages, logged once and served by ``/ready``."""
+
+    def __init__(self, started: float | None = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.stages = {}
+        self.errors = {}
+        self.ready = False
+        self.total_seconds = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.perf_counter() - start, 4)
+
+    def record(self, name: str, seconds: float):
+        self.stages[name] = round(seconds, 4)
+
+    def fail(self, name: str, error: Exception):
+        self.errors[name] = f"{type(error).__name__}: {error}"
+
+    def finish(self):
+        self.ready = True
+        self.total_seconds = round(time.perf_counter() - self.started, 4)
+        breakdown = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in self.stages.items())
+        logger.info(f"Startup finished in {self.total_seconds:.3f}s ({breakdown})", extra=self.as_dict())
+        if self.errors:
+            logger.warning(f"Startup warm-up had errors: {self.errors}")
+
+    def as_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "total_seconds": self.total_seconds,
+            "stages": dict(self.stages),
+            "errors": dict(self.errors),
+        }
+
+
+async def warm_driver_pool(driver, connections: int = NEO4J_WARM_CONNECTIONS) -> int:
+    """Open ``connections`` pooled Bolt connections by running that many sessions at once."""
+    if driver is None or connections <= 0:
+        return 0
+    await driver.verify_connectivity()
+
+    async def ping():
+        async with driver.session() as session:
+            result = await session.run("RETURN 1")
+            await result.consume()
+
+    await asyncio.gather(*(ping() for _ in range(connections)))
+    return connections
+
+
+async def run_warmup_queries(search, queries: list[str] = WARMUP_QUERIES, timeout: float = WARMUP_TIMEOUT) -> int:
+    """Run ``search(query)`` for every warm-up query concurrently; returns how many succeeded."""
+    if not queries:
+        return 0
+    results = await asyncio.wait_for(
+        asyncio.gather(*(search(q) for q in queries), return_exceptions=True), timeout
+    )
+    failures = [r for r in results if isinstance(r, BaseException)]
+    for failure in failures:
+        logger.warning(f"Warm-up query failed: {failure}")
+    return len(queries) - len(failures)